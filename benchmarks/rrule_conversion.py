@@ -0,0 +1,75 @@
+"""Compare the direct rrule conversions with the string round trip.
+
+Run from the repository root::
+
+    python benchmarks/rrule_conversion.py
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+django.setup()
+
+from dateutil.rrule import MONTHLY, TH, TU, rrule  # noqa: E402
+import recurrence  # noqa: E402
+
+from django_ical import utils  # noqa: E402
+from django_ical.tests.test_recurrence import (  # noqa: E402
+    build_rrule_from_dateutil_text,
+    build_rrule_from_recurrence_text,
+)
+
+NUMBER = 20000
+
+DATEUTIL_RULE = rrule(
+    MONTHLY,
+    interval=2,
+    count=10,
+    bymonth=(1, 3, 5),
+    byweekday=(TU(1), TH(-1)),
+    dtstart=datetime.datetime(2024, 1, 1, 9, 0),
+)
+
+RECURRENCE_RULE = recurrence.Rule(
+    recurrence.WEEKLY,
+    interval=2,
+    wkst=1,
+    count=10,
+    byday=[recurrence.to_weekday("-1MO"), recurrence.to_weekday("TU")],
+    bymonth=[1, 3],
+)
+
+
+def bench(name, direct, text, rule):
+    direct_time = timeit.timeit(lambda: direct(rule), number=NUMBER)
+    text_time = timeit.timeit(lambda: text(rule), number=NUMBER)
+    print(
+        "%-10s direct %6.1f us  string %6.1f us  speedup %.1fx"
+        % (
+            name,
+            direct_time / NUMBER * 1e6,
+            text_time / NUMBER * 1e6,
+            text_time / direct_time,
+        )
+    )
+
+
+if __name__ == "__main__":
+    bench(
+        "dateutil",
+        utils.build_rrule_from_dateutil_rrule,
+        build_rrule_from_dateutil_text,
+        DATEUTIL_RULE,
+    )
+    bench(
+        "recurrence",
+        utils.build_rrule_from_recurrences_rrule,
+        build_rrule_from_recurrence_text,
+        RECURRENCE_RULE,
+    )
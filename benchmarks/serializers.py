@@ -0,0 +1,65 @@
+"""Compare the serializers of ICal20Feed on the same feed.
+
+Run from the repository root::
+
+    python benchmarks/serializers.py
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+django.setup()
+
+from django_ical import feedgenerator  # noqa: E402
+
+ITEMS = 2000
+NUMBER = 5
+
+SERIALIZERS = (
+    feedgenerator.ContentLineWriter,
+    feedgenerator.ICalendarSerializer,
+)
+
+
+def build_feed():
+    feed = feedgenerator.ICal20Feed(
+        "Benchmark",
+        "/events",
+        "Serializer benchmark",
+        timestamp=datetime.datetime(2024, 1, 1),
+    )
+    start = datetime.datetime(2024, 1, 1, 9, 0, tzinfo=datetime.timezone.utc)
+    for i in range(ITEMS):
+        feed.add_item(
+            "Event %d" % i,
+            "/events/%d" % i,
+            "A description, long enough to be folded; with characters\n"
+            "that have to be escaped. " * 3,
+            start_datetime=start + datetime.timedelta(hours=i),
+            end_datetime=start + datetime.timedelta(hours=i + 1),
+            location="Room %d" % (i % 10),
+            categories=["Meeting", "Team %d" % (i % 5)],
+        )
+    return feed
+
+
+def bench(feed, serializer_class):
+    feed.serializer_class = serializer_class
+    seconds = timeit.timeit(lambda: b"".join(feed.iter_chunks()), number=NUMBER)
+    print(
+        "%-20s %7.1f us per item"
+        % (serializer_class.__name__, seconds / NUMBER / ITEMS * 1e6)
+    )
+    return seconds
+
+
+if __name__ == "__main__":
+    feed = build_feed()
+    times = [bench(feed, serializer_class) for serializer_class in SERIALIZERS]
+    print("speedup %.1fx" % (times[1] / times[0]))
@@ -0,0 +1,105 @@
+"""
+Query instrumentation for rendering ical feeds.
+"""
+
+import logging
+from collections import Counter
+from threading import local
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("QueryBudgetExceeded", "QueryRecorder")
+
+# The recorder of the feed currently rendering in this thread, if any.
+_active = local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when rendering a feed runs more queries than its budget allows.
+    """
+
+
+class QueryRecorder:
+    """
+    Counts database queries per feed accessor while a feed renders.
+
+    The recorder is installed with ``connection.execute_wrapper`` and
+    attributes every query to the accessor (``items``, ``item_title``, ...)
+    being evaluated when it ran. Queries run outside of an accessor, such
+    as the ones iterating over ``items()``, are attributed to ``None``.
+    """
+
+    def __init__(self):
+        self.accessor = None
+        self.calls = Counter()
+        self.queries = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[self.accessor] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        _active.recorder = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.recorder = None
+
+    @staticmethod
+    def active():
+        """
+        Returns the recorder active in the current thread, if any.
+        """
+        return getattr(_active, "recorder", None)
+
+    def record(self, accessor, func, *args):
+        """
+        Calls ``func`` attributing its queries to ``accessor``.
+        """
+        previous, self.accessor = self.accessor, accessor
+        self.calls[accessor] += 1
+        try:
+            return func(*args)
+        finally:
+            self.accessor = previous
+
+    @property
+    def total(self):
+        return sum(self.queries.values())
+
+    def scaling_accessors(self):
+        """
+        Returns the item accessors that ran at least one query per item.
+        """
+        return sorted(
+            accessor
+            for accessor, count in self.queries.items()
+            if accessor
+            and accessor.startswith("item_")
+            and self.calls[accessor] > 1
+            and count >= self.calls[accessor]
+        )
+
+    def check(self, feed, budget=None):
+        """
+        Logs accessors whose queries scale with the number of items and
+        raises QueryBudgetExceeded if more than ``budget`` queries ran.
+        """
+        name = type(feed).__name__
+        for accessor in self.scaling_accessors():
+            logger.warning(
+                "%s.%s ran %d queries for %d items",
+                name,
+                accessor,
+                self.queries[accessor],
+                self.calls[accessor],
+            )
+        if budget is not None and self.total > budget:
+            details = ", ".join(
+                f"{accessor or '(other)'}={count}"
+                for accessor, count in self.queries.most_common()
+            )
+            raise QueryBudgetExceeded(
+                f"{name} ran {self.total} queries, budget is {budget} ({details})"
+            )
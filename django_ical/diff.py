@@ -0,0 +1,201 @@
+"""
+Semantic comparison of rendered calendars.
+
+Two iCalendar documents are compared component by component instead of
+line by line, so differences in folding, in the order of components,
+properties and parameters, and in DTSTAMP are not reported. It can be
+run on two files::
+
+    python -m django_ical.diff old.ics new.ics
+"""
+
+import sys
+from collections import Counter, defaultdict, namedtuple
+
+__all__ = ("Difference", "diff_calendars", "iter_components")
+
+# Properties that change on every render and are ignored by default
+IGNORED_PROPERTIES = ("DTSTAMP",)
+
+Difference = namedtuple("Difference", ("key", "kind", "removed", "added"))
+Difference.__doc__ = """
+A difference between two calendars.
+
+:key: (component name, UID, RECURRENCE-ID) of the component, or the
+    component name and TZID for VTIMEZONE and the name for VCALENDAR
+:kind: "added", "removed" or "changed"
+:removed: properties only in the first calendar
+:added: properties only in the second calendar
+"""
+
+
+def _iter_lines(source):
+    """
+    Yields the unfolded content lines of source.
+
+    source is a path, bytes, or a binary file or iterable of bytes lines.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as infile:
+            yield from _iter_lines(infile)
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = bytes(source).splitlines(keepends=True)
+
+    line = None
+    for raw in source:
+        raw = raw.rstrip(b"\r\n")
+        if raw[:1] in (b" ", b"\t"):
+            if line is not None:
+                line += raw[1:]
+            continue
+        if line is not None:
+            yield line.decode("utf-8")
+        line = raw if raw else None
+    if line is not None:
+        yield line.decode("utf-8")
+
+
+def _split_line(line):
+    """
+    Splits a content line into its name, parameters and value.
+    """
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            head, value = line[:index], line[index + 1 :]
+            break
+    else:
+        head, value = line, ""
+
+    parts = []
+    quoted = False
+    start = 0
+    for index, char in enumerate(head):
+        if char == '"':
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            parts.append(head[start:index])
+            start = index + 1
+    parts.append(head[start:])
+    return parts[0].upper(), parts[1:], value
+
+
+def _canonical(name, params, value):
+    """
+    Returns the content line with its name and parameter names uppercased
+    and the parameters sorted.
+    """
+    params = sorted(
+        "%s=%s" % (key.upper(), val)
+        for key, _, val in (param.partition("=") for param in params)
+    )
+    return ";".join([name] + params) + ":" + value
+
+
+def iter_components(source, ignore=IGNORED_PROPERTIES):
+    """
+    Yields (key, properties) for the VCALENDAR and every top-level
+    component of source, in document order.
+
+    properties is a Counter of the canonical content lines of the
+    component. Nested components, such as VALARM, count as a single
+    property holding their own sorted lines.
+    """
+    ignore = {name.upper() for name in ignore}
+    stack = []
+    for line in _iter_lines(source):
+        name, params, value = _split_line(line)
+        if name == "BEGIN":
+            stack.append((value.upper(), Counter(), {}))
+        elif name == "END":
+            component, properties, ids = stack.pop()
+            if stack and stack[-1][0] != "VCALENDAR":
+                # Nested component, part of its parent.
+                lines = sorted(properties.elements())
+                stack[-1][1]["%s:%s" % (component, "\n".join(lines))] += 1
+            elif component == "VTIMEZONE":
+                yield (component, ids.get("TZID")), properties
+            elif component == "VCALENDAR":
+                yield (component,), properties
+            else:
+                yield (component, ids.get("UID"), ids.get("RECURRENCE-ID")), properties
+        elif stack:
+            if name in ("UID", "RECURRENCE-ID", "TZID"):
+                stack[-1][2].setdefault(name, value)
+            if name not in ignore:
+                stack[-1][1][_canonical(name, params, value)] += 1
+
+
+def diff_calendars(first, second, ignore=IGNORED_PROPERTIES):
+    """
+    Yields the Differences between two calendars.
+
+    The components of first are indexed by their key, then second is
+    streamed and every component is compared with its counterpart as it
+    is read. Only the first calendar is held in memory, and the
+    comparison takes linear time.
+
+    Components sharing a key, like components without a UID, are matched
+    with an identical component first, then in document order. Those left
+    without a counterpart are reported as added or removed.
+
+    :param first: path, bytes, binary file or iterable of bytes lines
+    :param second: path, bytes, binary file or iterable of bytes lines
+    :param ignore: names of the properties that are not compared
+    """
+    # The sorted lines of the components of first, counted per key
+    index = defaultdict(Counter)
+    for key, properties in iter_components(first, ignore):
+        index[key][tuple(sorted(properties.elements()))] += 1
+
+    for key, properties in iter_components(second, ignore):
+        lines = tuple(sorted(properties.elements()))
+        candidates = index.get(key)
+        if not candidates:
+            yield Difference(key, "added", (), lines)
+            continue
+        old = lines if lines in candidates else next(iter(candidates))
+        candidates[old] -= 1
+        if not candidates[old]:
+            del candidates[old]
+        if old != lines:
+            old = Counter(old)
+            yield Difference(
+                key,
+                "changed",
+                tuple(sorted((old - properties).elements())),
+                tuple(sorted((properties - old).elements())),
+            )
+
+    for key, candidates in index.items():
+        for lines in candidates.elements():
+            yield Difference(key, "removed", lines, ())
+
+
+def main(argv=None):
+    """
+    Prints the differences between two calendar files.
+
+    Returns 1 if they differ, 0 otherwise.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("usage: python -m django_ical.diff FIRST SECOND", file=sys.stderr)
+        return 2
+
+    differs = False
+    for difference in diff_calendars(*argv):
+        differs = True
+        print("%s %s" % (difference.kind, " ".join(map(str, difference.key))))
+        for line in difference.removed:
+            print("- " + line)
+        for line in difference.added:
+            print("+ " + line)
+    return int(differs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
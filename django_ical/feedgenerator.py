@@ -27,11 +27,60 @@ For definitions of the iCalendar format see:
 http://www.ietf.org/rfc/rfc2445.txt
 """
 
-from icalendar import Calendar, Event, Todo
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+from io import BytesIO
+from time import monotonic
 
+from icalendar import Alarm, Calendar, Event, FreeBusy, Journal, Todo
+from icalendar.prop import vDDDLists, vText
+
+from django.conf import settings
 from django.utils.feedgenerator import SyndicationFeed
+from django.utils.module_loading import import_string
+from django.utils.timezone import (
+    get_default_timezone,
+    is_naive,
+    make_aware,
+    make_naive,
+)
+
+from django_ical.utils import RecurrenceRule, iter_occurrences, merge_intervals
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    "ICal20Feed",
+    "ICal20FreeBusyFeed",
+    "DefaultFeed",
+    "ContentLineWriter",
+    "AlarmTemplate",
+    "RenderBudget",
+    "Serializer",
+    "ICalendarSerializer",
+)
+
+# Maximum length of a content line in octets, excluding the line break.
+# See http://www.rfc-editor.org/rfc/rfc5545.txt (sec 3.1)
+LINE_LENGTH = 75
 
-__all__ = ("ICal20Feed", "DefaultFeed")
+# Number of buffered bytes after which the writer flushes to its output.
+CHUNK_SIZE = 64 * 1024
+
+FOOTER = b"END:VCALENDAR\r\n"
+
+# Serializer used unless set by the DJANGO_ICAL_SERIALIZER setting or the
+# serializer_class of the feed
+DEFAULT_SERIALIZER = "django_ical.feedgenerator.ContentLineWriter"
+
+# Calendar property naming the exceeded limit of a truncated feed
+TRUNCATED_PROPERTY = b"X-DJANGO-ICAL-TRUNCATED"
+
+# DTSTAMP of the items of deterministic feeds without any item date
+DETERMINISTIC_TIMESTAMP = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n"})
 
 FEED_FIELD_MAP = (
     ("product_id", "prodid"),
@@ -99,6 +148,487 @@ ITEM_ELEMENT_FIELD_MAP = (
     ("request_status", "request-status"),
 )
 
+
+class _ChunkList(list):
+    """Collects the chunks flushed by a ContentLineWriter."""
+
+    write = list.append
+
+
+class Serializer:
+    """
+    Interface of the backends serializing feeds.
+
+    A serializer is created for every render and writes the calendar to
+    ``outfile``: ``begin_calendar`` writes the VCALENDAR header of an
+    ICal20Feed, ``write_component`` every component of it, and
+    ``end_calendar`` closes the calendar and flushes what is left.
+
+    The serialized bytes are buffered and handed to ``outfile`` in chunks
+    of at most ``chunk_size`` bytes. With ``deterministic``, identical
+    components have to be serialized as identical bytes.
+    """
+
+    def __init__(
+        self,
+        outfile,
+        encoding="utf-8",
+        chunk_size=CHUNK_SIZE,
+        deterministic=False,
+    ):
+        self.outfile = outfile
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.deterministic = deterministic
+        self.buffer = bytearray()
+        self.flushed = 0
+
+    def begin_calendar(self, feed):
+        """
+        Writes the VCALENDAR header of feed, up to its first component.
+        """
+        raise NotImplementedError
+
+    def write_component(self, component):
+        """
+        Writes an icalendar component.
+        """
+        raise NotImplementedError
+
+    def end_calendar(self):
+        """
+        Closes the calendar and flushes the buffer.
+        """
+        self.write_raw(FOOTER)
+        self.flush()
+
+    def write_raw(self, data):
+        """
+        Writes already serialized and folded content lines.
+        """
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def tell(self):
+        """
+        Returns the number of bytes written so far.
+        """
+        return self.flushed + len(self.buffer)
+
+    def flush(self):
+        """
+        Hands the buffered bytes to the output file.
+        """
+        if self.buffer:
+            self.flushed += len(self.buffer)
+            self.outfile.write(bytes(self.buffer))
+            self.buffer.clear()
+
+
+class ContentLineWriter(Serializer):
+    """
+    Buffered writer for iCalendar content lines.
+
+    TEXT values are escaped and every line is folded at 75 octets in a
+    single pass into a ``bytearray``, which is handed to ``outfile`` in
+    chunks of at most ``chunk_size`` bytes instead of building the whole
+    calendar as one string first.
+
+    Properties are written in the fixed order of ``sorted_keys`` and
+    parameters sorted by name. With ``deterministic``, the values of
+    properties occurring several times, like ATTENDEE, are sorted as well.
+
+    This is the default serializer of ICal20Feed.
+    """
+
+    def begin_calendar(self, feed):
+        self.write_raw(feed.header(self.encoding))
+
+    def write_line(self, line):
+        """
+        Folds a single unfolded content line into the buffer.
+        """
+        buffer = self.buffer
+        start = 0
+        limit = LINE_LENGTH
+        end = len(line)
+        while end - start > limit:
+            cut = start + limit
+            # Never split a multi-byte UTF-8 sequence or a backslash escape.
+            while line[cut] & 0xC0 == 0x80:
+                cut -= 1
+            if line[cut - 1] == 0x5C and cut - 1 > start:
+                cut -= 1
+            buffer += line[start:cut]
+            buffer += b"\r\n "
+            start = cut
+            limit = LINE_LENGTH - 1
+        buffer += line[start:]
+        buffer += b"\r\n"
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_property(self, name, value):
+        """
+        Writes a single property value as a content line.
+        """
+        self.write_line(self.property_line(name, value))
+
+    def property_line(self, name, value):
+        """
+        Returns the unfolded content line of a property value.
+        """
+        if isinstance(value, vText):
+            ical = value.replace("\r\n", "\n").translate(TEXT_ESCAPES)
+            ical = ical.encode(self.encoding)
+        elif hasattr(value, "to_ical"):
+            ical = value.to_ical()
+        else:
+            ical = vText(value).to_ical()
+        if isinstance(ical, str):
+            ical = ical.encode(self.encoding)
+
+        line = bytearray(name.encode(self.encoding))
+        params = getattr(value, "params", None)
+        if params:
+            params = params.to_ical()
+            if isinstance(params, str):
+                params = params.encode(self.encoding)
+            if params:
+                line += b";"
+                line += params
+        line += b":"
+        line += ical
+        return line
+
+    def write_properties(self, component):
+        """
+        Writes the properties of a component.
+        """
+        for name in component.sorted_keys():
+            values = component[name]
+            if isinstance(values, list) and self.deterministic:
+                lines = sorted(self.property_line(name, value) for value in values)
+                for line in lines:
+                    self.write_line(line)
+            elif isinstance(values, list):
+                for value in values:
+                    self.write_property(name, value)
+            else:
+                self.write_property(name, values)
+
+    def write_component(self, component):
+        """
+        Writes a component, its properties and its subcomponents.
+        """
+        if isinstance(component, AlarmTemplate):
+            self.write_raw(component.serialized(self.encoding))
+            return
+        self.write_line(b"BEGIN:" + component.name.encode(self.encoding))
+        self.write_properties(component)
+        for subcomponent in component.subcomponents:
+            self.write_component(subcomponent)
+        self.write_line(b"END:" + component.name.encode(self.encoding))
+
+
+class ICalendarSerializer(Serializer):
+    """
+    Serializer using icalendar's own ``to_ical``.
+
+    Every component is serialized into a string and folded by icalendar
+    before it is encoded, which is slower than ContentLineWriter. Values
+    of properties occurring several times aren't sorted for
+    ``deterministic`` output.
+    """
+
+    def begin_calendar(self, feed):
+        ical = header_calendar(feed.header_values()).to_ical()
+        self.write_raw(ical[: -len(FOOTER)])
+
+    def write_component(self, component):
+        self.write_raw(component.to_ical())
+
+
+class RenderBudget:
+    """
+    Limits of a single render of a feed.
+
+    :max_items: Maximum number of components.
+    :max_bytes: Bytes after which no further component is written.
+    :max_time: Seconds after which no further component is written,
+        counted from the creation of the budget.
+    """
+
+    def __init__(self, max_items=None, max_bytes=None, max_time=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_time = max_time
+        self.started = monotonic()
+
+    def exceeded(self, items, size):
+        """
+        Returns the name of the limit reached after writing items components
+        of size bytes, or None.
+        """
+        if self.max_items is not None and items >= self.max_items:
+            return "items"
+        if self.max_bytes is not None and size >= self.max_bytes:
+            return "bytes"
+        if self.max_time is not None and monotonic() - self.started >= self.max_time:
+            return "time"
+        return None
+
+
+class AlarmTemplate(Alarm):
+    """
+    A VALARM shared by many items.
+
+    Properties are passed as keyword arguments, with dashes in their names
+    written as underscores. The alarm is serialized once per encoding and
+    the same bytes are written for every item it is added to, so it can't
+    be changed once created.
+    """
+
+    def __init__(self, **properties):
+        super().__init__()
+        for name, value in properties.items():
+            self.add(name.replace("_", "-"), value)
+        if "ACTION" not in self or "TRIGGER" not in self:
+            raise ValueError("An alarm needs an action and a trigger.")
+        self._serialized = {}
+        self._frozen = True
+
+    def __setitem__(self, key, value):
+        if getattr(self, "_frozen", False):
+            raise TypeError("AlarmTemplate objects are immutable.")
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if getattr(self, "_frozen", False):
+            raise TypeError("AlarmTemplate objects are immutable.")
+        super().__delitem__(key)
+
+    def add_component(self, component):
+        if getattr(self, "_frozen", False):
+            raise TypeError("AlarmTemplate objects are immutable.")
+        super().add_component(component)
+
+    def serialized(self, encoding):
+        """
+        Returns the folded VALARM content lines.
+        """
+        serialized = self._serialized.get(encoding)
+        if serialized is None:
+            outfile = BytesIO()
+            writer = ContentLineWriter(outfile, encoding)
+            writer.write_line(b"BEGIN:VALARM")
+            writer.write_properties(self)
+            writer.write_line(b"END:VALARM")
+            writer.flush()
+            serialized = self._serialized[encoding] = outfile.getvalue()
+        return serialized
+
+
+@lru_cache(maxsize=256)
+def calendar_header(values, encoding):
+    """
+    Returns the serialized VCALENDAR header for the values of
+    FEED_FIELD_MAP, up to and including its last property.
+
+    The header is cached as feeds served by the same view usually
+    share all of these values.
+    """
+    outfile = BytesIO()
+    writer = ContentLineWriter(outfile, encoding)
+    writer.write_component(header_calendar(values))
+    writer.flush()
+    return outfile.getvalue()[: -len(FOOTER)]
+
+
+def header_calendar(values):
+    """
+    Returns a Calendar without components holding the values of
+    FEED_FIELD_MAP.
+    """
+    cal = Calendar()
+    cal.add("version", "2.0")
+    cal.add("calscale", "GREGORIAN")
+
+    for (ifield, efield), val in zip(FEED_FIELD_MAP, values):
+        if val is not None:
+            cal.add(efield, val)
+    return cal
+
+
+def _as_vrecur(rule):
+    """Uses the rendered value of RecurrenceRules."""
+    if isinstance(rule, RecurrenceRule):
+        return rule.to_vrecur()
+    if isinstance(rule, list):
+        return [_as_vrecur(item) for item in rule]
+    return rule
+
+
+def _is_date_lists(value):
+    """Whether value is a list of batched dates, as built by build_date_lists."""
+    return isinstance(value, list) and all(isinstance(v, vDDDLists) for v in value)
+
+
+def _add(element, name, value):
+    element.add(name, value)
+
+
+def _add_each(element, name, values):
+    for value in values:
+        element.add(name, value)
+
+
+def _add_components(element, name, components):
+    for component in components:
+        element.add_component(component)
+
+
+def _add_rule(element, name, rule):
+    element.add(name, _as_vrecur(rule))
+
+
+def _add_dates(element, name, dates):
+    if _is_date_lists(dates):
+        _add_each(element, name, dates)
+    else:
+        element.add(name, dates)
+
+
+# How item fields are added to their component, element.add by default
+ITEM_ENCODERS = {
+    "attendee": _add_each,
+    "valarm": _add_components,
+    "rrule": _add_rule,
+    "exrule": _add_rule,
+    "rdate": _add_dates,
+    "exdate": _add_dates,
+}
+
+
+class ComponentType:
+    """
+    A calendar component items are rendered as.
+
+    Only the item fields in ``fields`` are written, ``ICal20Feed.add_item``
+    rejects items setting any other field of ITEM_ELEMENT_FIELD_MAP. The
+    ``ignored`` fields are neither written nor rejected, for the syndication
+    fields every item has but the component doesn't support.
+    """
+
+    def __init__(self, component, fields, ignored=()):
+        self.component = component
+        self.fields = frozenset(fields)
+        self.ignored = frozenset(ignored)
+        self.invalid = frozenset(
+            ifield
+            for ifield, efield in ITEM_ELEMENT_FIELD_MAP
+            if ifield not in self.fields and ifield not in self.ignored
+        )
+        self.encoders = tuple(
+            (ifield, efield, ITEM_ENCODERS.get(ifield, _add))
+            for ifield, efield in ITEM_ELEMENT_FIELD_MAP
+            if ifield in self.fields
+        )
+
+    def validate(self, item):
+        """
+        Raises ValueError if item sets fields the component doesn't support.
+        """
+        invalid = sorted(f for f in self.invalid if item.get(f) is not None)
+        if invalid:
+            raise ValueError(
+                "%s doesn't support the item fields %s"
+                % (self.component.name, ", ".join(invalid))
+            )
+
+
+# Item fields shared by VEVENT, VTODO and VJOURNAL, see
+# http://www.rfc-editor.org/rfc/rfc5545.txt (sec 3.6)
+COMMON_ITEM_FIELDS = (
+    "unique_id",
+    "title",
+    "description",
+    "start_datetime",
+    "updateddate",
+    "created",
+    "timestamp",
+    "link",
+    "organizer",
+    "categories",
+    "rrule",
+    "exrule",
+    "rdate",
+    "exdate",
+    "status",
+    "attendee",
+    "attach",
+    "class",
+    "comment",
+    "contact",
+    "recurrence_id",
+    "related_to",
+    "sequence",
+    "request_status",
+)
+
+# The component types items can have, by their component_type
+COMPONENT_TYPES = {
+    "event": ComponentType(
+        Event,
+        COMMON_ITEM_FIELDS
+        + (
+            "end_datetime",
+            "duration",
+            "transparency",
+            "location",
+            "geolocation",
+            "priority",
+            "resources",
+            "valarm",
+        ),
+    ),
+    "todo": ComponentType(
+        Todo,
+        COMMON_ITEM_FIELDS
+        + (
+            "due",
+            "duration",
+            "completed",
+            "percent_complete",
+            "location",
+            "geolocation",
+            "priority",
+            "resources",
+            "valarm",
+        ),
+    ),
+    "journal": ComponentType(Journal, COMMON_ITEM_FIELDS),
+    "freebusy": ComponentType(
+        FreeBusy,
+        (
+            "unique_id",
+            "timestamp",
+            "start_datetime",
+            "end_datetime",
+            "link",
+            "organizer",
+            "attendee",
+            "comment",
+            "contact",
+            "freebusy",
+            "request_status",
+        ),
+        ignored=("title", "description", "categories", "updateddate"),
+    ),
+}
+
+
 class ICal20Feed(SyndicationFeed):
     """
     iCalendar 2.0 Feed implementation.
@@ -106,49 +636,328 @@ class ICal20Feed(SyndicationFeed):
 
     mime_type = "text/calendar; charset=utf-8"
 
+    # Serializer class, defaults to the DJANGO_ICAL_SERIALIZER setting
+    serializer_class = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deferred_items = []
+        # Whether the components are being written, and the latest
+        # updateddate or pubdate of the items written so far
+        self.writing = False
+        self.written_latest_date = None
+        self.truncated = None
+        self.header_size = None
+
+    def add_item(self, *args, **kwargs):
+        """
+        Adds an item, checking its fields are valid for its component type.
+        """
+        component_type = kwargs.get("component_type") or "event"
+        if component_type not in COMPONENT_TYPES:
+            raise ValueError(
+                "Unknown component type %r, expected one of: %s"
+                % (component_type, ", ".join(COMPONENT_TYPES))
+            )
+        COMPONENT_TYPES[component_type].validate(kwargs)
+        super().add_item(*args, **kwargs)
+
+    def defer_items(self, items):
+        """
+        Adds the items of an iterable of add_item keyword arguments, which
+        is only consumed while the feed is serialized.
+
+        Every item is added and serialized before the next one is read,
+        so an iterable producing them on demand is never held in memory
+        as a whole.
+        """
+        self.deferred_items.append(items)
+
+    def iter_items(self):
+        """
+        Yields the added items, then the deferred ones as they are read.
+        """
+        yield from self.items
+        while self.deferred_items:
+            for kwargs in self.deferred_items.pop(0):
+                self.add_item(**kwargs)
+                yield self.items.pop()
+
+    def latest_post_date(self):
+        """
+        Returns the latest updateddate or pubdate of the items, or the
+        current time if none has one.
+
+        Once the feed is written, only the items written so far count, so
+        neither deferred items nor the ones left out of a truncated feed
+        are missed.
+        """
+        if self.writing:
+            latest_date = self.written_latest_date
+        else:
+            latest_date = _latest_date(self.items)
+        return latest_date or datetime.now(tz=timezone.utc)
+
     def write(self, outfile, encoding):
         """
         Writes the feed to the specified file in the
         specified encoding.
+
+        With a render budget, the chunks are held until the feed is
+        rendered, so that the header of a truncated feed can name the
+        exceeded limit in its TRUNCATED_PROPERTY. The chunks aren't joined:
+        only the first one, which holds the header, is copied.
+        """
+        if self.feed.get("render_budget") is None:
+            for chunk in self.iter_chunks(encoding):
+                outfile.write(chunk)
+            return
+
+        chunks = list(self.iter_chunks(encoding))
+        if self.truncated:
+            # The header is written at once, so it ends in the first chunk.
+            line = TRUNCATED_PROPERTY + b":" + self.truncated.encode(encoding)
+            first = chunks[0]
+            chunks[0] = (
+                first[: self.header_size] + line + b"\r\n" + first[self.header_size :]
+            )
+        for chunk in chunks:
+            outfile.write(chunk)
+
+    def get_serializer_class(self):
+        """
+        Returns serializer_class, or the class named by the
+        DJANGO_ICAL_SERIALIZER setting.
+        """
+        if self.serializer_class is not None:
+            return self.serializer_class
+        return import_string(
+            getattr(settings, "DJANGO_ICAL_SERIALIZER", DEFAULT_SERIALIZER)
+        )
+
+    def iter_chunks(self, encoding="utf-8", chunk_size=CHUNK_SIZE):
+        """
+        Yields the serialized feed in chunks of about chunk_size bytes.
+
+        Components are serialized as they are built by the serializer of
+        get_serializer_class, so the feed is never held in memory as a
+        whole. No more than chunk_size bytes are buffered
+        before a chunk is yielded, and deferred items are only read when
+        the next chunk is requested.
+
+        When the RenderBudget of the ``render_budget`` feed field is
+        exceeded, the calendar is closed without the remaining components
+        and ``truncated`` is set to the name of the exceeded limit.
         """
-        cal = Calendar()
-        cal.add("version", "2.0")
-        cal.add("calscale", "GREGORIAN")
+        chunks = _ChunkList()
+        serializer = self.get_serializer_class()(
+            chunks,
+            encoding,
+            chunk_size=chunk_size,
+            deterministic=bool(self.feed.get("deterministic")),
+        )
+        budget = self.feed.get("render_budget")
+        serializer.begin_calendar(self)
+        self.header_size = serializer.tell()
+        for count, component in enumerate(self.iter_components()):
+            if budget is not None:
+                self.truncated = budget.exceeded(count, serializer.tell())
+                if self.truncated:
+                    logger.warning(
+                        "Truncated the calendar %r after %d components, "
+                        "its %s budget is exceeded",
+                        self.feed["title"],
+                        count,
+                        self.truncated,
+                    )
+                    break
+            serializer.write_component(component)
+            if chunks:
+                yield from chunks
+                chunks.clear()
+        serializer.end_calendar()
+        yield from chunks
 
-        for ifield, efield in FEED_FIELD_MAP:
-            val = self.feed.get(ifield)
-            if val is not None:
-                cal.add(efield, val)
+    def _latest_item_date(self):
+        """
+        Returns the latest updateddate or pubdate of the items, if any.
+        """
+        dates = [
+            item.get("updateddate") or item.get("pubdate")
+            for item in self.items
+            if item.get("updateddate") or item.get("pubdate")
+        ]
+        return max(dates) if dates else None
 
-        self.write_items(cal)
+    def header(self, encoding):
+        """
+        Returns the serialized VCALENDAR header of the feed.
+        """
+        values = self.header_values()
+        try:
+            return calendar_header(values, encoding)
+        except TypeError:
+            # Unhashable values can't be cached.
+            return calendar_header.__wrapped__(values, encoding)
 
-        to_ical = getattr(cal, "as_string", None)
-        if not to_ical:
-            to_ical = cal.to_ical
-        outfile.write(to_ical())
+    def header_values(self):
+        """
+        Returns the values of FEED_FIELD_MAP of the feed.
+        """
+        return tuple(self.feed.get(ifield) for ifield, efield in FEED_FIELD_MAP)
 
     def write_items(self, calendar):
         """
         Write all elements to the calendar
         """
-        for item in self.items:
-            component_type = item.get("component_type")
-            if component_type == "todo":
-                element = Todo()
-            else:
-                element = Event()
-            for ifield, efield in ITEM_ELEMENT_FIELD_MAP:
+        for component in self.iter_components():
+            calendar.add_component(component)
+
+    def iter_components(self):
+        """
+        Yields the calendar component of every item.
+
+        With the ``deterministic`` feed field, items are sorted by UID,
+        RECURRENCE-ID and DTSTART, and items without a DTSTAMP of their own
+        get the latest modification date of the feed instead of the render
+        time, or DETERMINISTIC_TIMESTAMP if neither the items nor the feed
+        have one, so identical data always renders identical bytes.
+        Deferred items are read into memory to be sorted then.
+        """
+        self.writing = True
+        timestamp = self.feed.get("timestamp")
+        if self.feed.get("deterministic"):
+            self.items = list(self.iter_items())
+            items = sorted(self.items, key=_item_sort_key)
+            timestamp = self._latest_item_date() or timestamp or DETERMINISTIC_TIMESTAMP
+        else:
+            items = self.iter_items()
+        for item in items:
+            component_type = COMPONENT_TYPES[item.get("component_type") or "event"]
+            element = component_type.component()
+            for ifield, efield, encode in component_type.encoders:
                 val = item.get(ifield)
+                if ifield == "timestamp" and val is None:
+                    # Stable DTSTAMP: the item's modification or render time.
+                    val = item.get("updateddate") or timestamp
                 if val is not None:
-                    if ifield == "attendee":
-                        for list_item in val:
-                            element.add(efield, list_item)
-                    elif ifield == "valarm":
-                        for list_item in val:
-                            element.add_component(list_item)
-                    else:
-                        element.add(efield, val)
-            calendar.add_component(element)
+                    encode(element, efield, val)
+            yield element
+            # Only reached once the component was written.
+            self.written_latest_date = _latest_date((item,), self.written_latest_date)
+
+
+def _latest_date(items, latest_date=None):
+    """
+    Returns the latest updateddate or pubdate of items, or latest_date if
+    it is later, as SyndicationFeed.latest_post_date does.
+    """
+    for item in items:
+        for date_key in ("updateddate", "pubdate"):
+            item_date = item.get(date_key)
+            if item_date and (latest_date is None or item_date > latest_date):
+                latest_date = item_date
+    return latest_date
+
+
+def _item_sort_key(item):
+    # str() orders dates, naive and aware datetimes without comparing them.
+    return (
+        str(item.get("unique_id") or ""),
+        str(item.get("recurrence_id") or ""),
+        str(item.get("start_datetime") or ""),
+    )
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc)
+
+
+class ICal20FreeBusyFeed(ICal20Feed):
+    """
+    iCalendar 2.0 free/busy feed implementation.
+
+    Publishes the busy time of all items between the ``freebusy_start``
+    and ``freebusy_end`` feed fields as a single VFREEBUSY component.
+    Recurring items are expanded within that window and overlapping
+    occurrences are merged, so the feed only contains one FREEBUSY
+    period per busy stretch. Transparent and cancelled items are ignored.
+
+    The occurrences in the ``occurrence_index`` feed field, an
+    occurrences.OccurrenceIndex, are busy time as well.
+
+    Naive datetimes, of the window or of items, are in the default time
+    zone. Items without a start_datetime are ignored.
+    """
+
+    def iter_components(self):
+        """
+        Yields the VFREEBUSY component with the merged busy time of all items.
+        """
+        tz = get_default_timezone()
+        start = self.feed["freebusy_start"]
+        end = self.feed["freebusy_end"]
+        if is_naive(start):
+            start = make_aware(start, tz)
+        if is_naive(end):
+            end = make_aware(end, tz)
+
+        busy = []
+        for item in self.iter_items():
+            if not item.get("start_datetime"):
+                continue
+            if item.get("transparency") == "TRANSPARENT":
+                continue
+            if item.get("status") == "CANCELLED":
+                continue
+            busy.extend(self._iter_busy(item, start, end, tz))
+
+        index = self.feed.get("occurrence_index")
+        if index is not None:
+            busy.extend(occurrence[:2] for occurrence in index.between(start, end))
+
+        element = FreeBusy()
+        timestamp = self.feed.get("timestamp")
+        if timestamp is not None:
+            element.add("dtstamp", timestamp)
+        element.add("dtstart", _as_utc(start))
+        element.add("dtend", _as_utc(end))
+        for period_start, period_end in merge_intervals(busy):
+            element.add(
+                "freebusy",
+                (_as_utc(max(period_start, start)), _as_utc(min(period_end, end))),
+            )
+        yield element
+
+    @staticmethod
+    def _iter_busy(item, start, end, tz):
+        """
+        Yields the aware (start, end) datetimes of the occurrences of item
+        overlapping the window.
+
+        Items with naive datetimes are expanded in naive local time, so
+        their rules follow DST changes, and their occurrences made aware.
+        """
+        naive = isinstance(item["start_datetime"], datetime) and is_naive(
+            item["start_datetime"]
+        )
+        if naive:
+            start, end = make_naive(start, tz), make_naive(end, tz)
+        for occurrence in iter_occurrences(
+            item["start_datetime"],
+            item.get("end_datetime"),
+            rrule=item.get("rrule"),
+            exrule=item.get("exrule"),
+            rdate=item.get("rdate"),
+            exdate=item.get("exdate"),
+            after=start,
+            before=end,
+        ):
+            if naive:
+                occurrence = tuple(make_aware(value, tz) for value in occurrence)
+            yield occurrence
 
 
 DefaultFeed = ICal20Feed
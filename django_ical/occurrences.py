@@ -0,0 +1,221 @@
+"""
+Index of the occurrences of recurring items.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import timedelta
+from heapq import merge
+from operator import itemgetter
+from threading import RLock
+
+from django_ical.utils import iter_occurrences
+
+__all__ = ("OccurrenceIndex",)
+
+
+class _Bucket:
+    """
+    Occurrences sorted by their start, along with the longest duration
+    among them, which bounds how far before a window they are searched.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.occurrences = []
+        self.durations = Counter()
+        self.max_duration = timedelta(0)
+
+    def __len__(self):
+        return len(self.occurrences)
+
+    def insert(self, occurrence):
+        index = bisect_right(self.starts, occurrence[0])
+        self.starts.insert(index, occurrence[0])
+        self.occurrences.insert(index, occurrence)
+        self._add_duration(occurrence)
+
+    def extend(self, occurrences):
+        """
+        Inserts many occurrences at once, sorting them with the others.
+        """
+        if not occurrences:
+            return
+        self.occurrences.extend(occurrences)
+        self.occurrences.sort(key=itemgetter(0))
+        self.starts[:] = [occurrence[0] for occurrence in self.occurrences]
+        for occurrence in occurrences:
+            self._add_duration(occurrence)
+
+    def remove(self, occurrence):
+        lo = bisect_left(self.starts, occurrence[0])
+        hi = bisect_right(self.starts, occurrence[0], lo)
+        for index in range(lo, hi):
+            if self.occurrences[index] is occurrence:
+                del self.starts[index]
+                del self.occurrences[index]
+                break
+        duration = occurrence[1] - occurrence[0]
+        self.durations[duration] -= 1
+        if not self.durations[duration]:
+            del self.durations[duration]
+            if duration == self.max_duration:
+                self.max_duration = max(self.durations, default=timedelta(0))
+
+    def between(self, after, before):
+        lo = bisect_left(self.starts, after - self.max_duration)
+        hi = bisect_left(self.starts, before, lo)
+        return [
+            occurrence
+            for occurrence in self.occurrences[lo:hi]
+            if occurrence[1] > after
+        ]
+
+    def _add_duration(self, occurrence):
+        duration = occurrence[1] - occurrence[0]
+        self.durations[duration] += 1
+        self.max_duration = max(self.max_duration, duration)
+
+
+class OccurrenceIndex:
+    """
+    Index of the occurrences of items, keyed by an item key such as its pk.
+
+    The rules of every item are expanded once within the horizon between
+    ``after`` and ``before``, and the occurrences are kept in lists sorted
+    by their start. Adding, updating and removing an item inserts and
+    deletes its occurrences in place with a binary search, and the
+    horizon is extended on demand when a window reaches beyond it.
+
+    The occurrences overlapping a window are found with a binary search
+    from the window start minus the longest duration. Occurrences longer
+    than ``long_duration`` are kept apart, so a few long events don't make
+    every window scan back to their start.
+    """
+
+    def __init__(self, after, before, long_duration=timedelta(days=1)):
+        self.after = after
+        self.before = before
+        self.long_duration = long_duration
+        self._lock = RLock()
+        self._short = _Bucket()
+        self._long = _Bucket()
+        self._rules = {}
+        self._occurrences = {}
+
+    def __len__(self):
+        return len(self._short) + len(self._long)
+
+    def __contains__(self, key):
+        return key in self._rules
+
+    def add(  # noqa
+        self,
+        key,
+        start,
+        end=None,
+        rrule=None,
+        exrule=None,
+        rdate=None,
+        exdate=None,
+    ):
+        """
+        Indexes the occurrences of an item, replacing any previously
+        indexed occurrences of the same key.
+
+        The arguments are the ones of utils.iter_occurrences.
+        """
+        rules = {
+            "start": start,
+            "end": end,
+            "rrule": rrule,
+            "exrule": exrule,
+            "rdate": rdate,
+            "exdate": exdate,
+        }
+        with self._lock:
+            self.remove(key)
+            self._rules[key] = rules
+            self._occurrences[key] = []
+            for occurrence in self._expand(key, rules, self.after, self.before):
+                self._bucket(occurrence).insert(occurrence)
+
+    update = add
+
+    def remove(self, key):
+        """
+        Removes the occurrences of an item from the index.
+        """
+        with self._lock:
+            if self._rules.pop(key, None) is None:
+                return
+            for occurrence in self._occurrences.pop(key):
+                self._bucket(occurrence).remove(occurrence)
+
+    def between(self, after, before):
+        """
+        Returns the ``(start, end, key)`` tuples of all occurrences
+        overlapping the window between ``after`` and ``before``, sorted
+        by start.
+        """
+        with self._lock:
+            self._extend(after, before)
+            return list(
+                merge(
+                    self._long.between(after, before),
+                    self._short.between(after, before),
+                    key=itemgetter(0),
+                )
+            )
+
+    def keys_between(self, after, before):
+        """
+        Returns the keys of the items occurring in the window between
+        ``after`` and ``before``, in the order of their first occurrence.
+        """
+        keys = {}
+        for occurrence in self.between(after, before):
+            keys.setdefault(occurrence[2], None)
+        return list(keys)
+
+    def _bucket(self, occurrence):
+        if occurrence[1] - occurrence[0] > self.long_duration:
+            return self._long
+        return self._short
+
+    def _expand(self, key, rules, after, before, keep=None):
+        """
+        Yields the occurrences of an item in the window and records them
+        under its key.
+        """
+        occurrences = self._occurrences[key]
+        for start, end in iter_occurrences(after=after, before=before, **rules):
+            if keep is not None and not keep(start, end):
+                continue
+            occurrence = (start, end, key)
+            occurrences.append(occurrence)
+            yield occurrence
+
+    def _extend(self, after, before):
+        """
+        Expands the indexed rules into the parts of the window outside
+        of the horizon.
+        """
+        windows = []
+        if after < self.after:
+            horizon = self.after
+            windows.append((after, horizon, lambda start, end: end <= horizon))
+            self.after = after
+        if before > self.before:
+            horizon = self.before
+            windows.append((horizon, before, lambda start, end: start >= horizon))
+            self.before = before
+        if not windows:
+            return
+        added = {self._short: [], self._long: []}
+        for key, rules in self._rules.items():
+            for window in windows:
+                for occurrence in self._expand(key, rules, *window):
+                    added[self._bucket(occurrence)].append(occurrence)
+        for bucket, occurrences in added.items():
+            bucket.extend(occurrences)
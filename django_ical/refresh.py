@@ -0,0 +1,134 @@
+"""
+Backends refreshing stale cached feeds outside of the request.
+"""
+
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    "RefreshBackend",
+    "RefreshTask",
+    "ThreadPoolRefreshBackend",
+    "get_default_backend",
+)
+
+
+class RefreshTask(namedtuple("RefreshTask", "key feed url language args kwargs etag")):
+    """
+    A refresh of a cached feed.
+
+    It only holds serializable values, so it can be sent to a task queue
+    and run in another process: the cache key to write, the dotted path of
+    the feed class, the absolute URL and language of the request, the
+    arguments the view was called with and the ETag of the feed.
+
+    The feed class must be importable and take no arguments.
+    """
+
+    __slots__ = ()
+
+    def build_request(self):
+        """
+        Returns a GET request for the URL of the feed.
+        """
+        url = urlsplit(self.url)
+        secure = url.scheme == "https"
+        return WSGIRequest(
+            {
+                "REQUEST_METHOD": "GET",
+                "SCRIPT_NAME": "",
+                "PATH_INFO": unquote_to_bytes(url.path).decode("iso-8859-1"),
+                "QUERY_STRING": url.query,
+                "SERVER_NAME": url.hostname,
+                "SERVER_PORT": str(url.port or (443 if secure else 80)),
+                "HTTP_HOST": url.netloc,
+                "wsgi.url_scheme": url.scheme,
+                "wsgi.input": BytesIO(),
+            }
+        )
+
+    def run(self):
+        """
+        Renders the feed into the cache in the language of the request.
+        """
+        feed = import_string(self.feed)()
+        request = self.build_request()
+        with translation.override(self.language):
+            obj = feed.get_object(request, *self.args, **self.kwargs)
+            return feed.refresh_cache(obj, request, self.etag, key=self.key)
+
+
+class RefreshBackend:
+    """
+    Interface of the backends running feed refreshes.
+
+    ``enqueue`` receives a RefreshTask. A backend for a task queue would
+    send the fields of the task to a worker, which rebuilds it and calls
+    its ``run`` method.
+    """
+
+    def enqueue(self, task):
+        """
+        Schedules task to run, unless a refresh of task.key is already
+        pending.
+        """
+        raise NotImplementedError
+
+
+class ThreadPoolRefreshBackend(RefreshBackend):
+    """
+    Runs refreshes in a thread pool of the current process.
+
+    Refreshes of a key that is already queued or running are dropped.
+    """
+
+    def __init__(self, max_workers=2):
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="django_ical-refresh"
+        )
+        self._pending = set()
+        self._lock = Lock()
+
+    def enqueue(self, task):
+        with self._lock:
+            if task.key in self._pending:
+                return None
+            self._pending.add(task.key)
+        return self.executor.submit(self._run, task)
+
+    def _run(self, task):
+        try:
+            task.run()
+        except Exception:
+            logger.exception("Refreshing the cached feed %s failed", task.key)
+        finally:
+            with self._lock:
+                self._pending.discard(task.key)
+            # Worker threads open their own database connections.
+            connections.close_all()
+
+
+_default_backend = None
+_default_backend_lock = Lock()
+
+
+def get_default_backend():
+    """
+    Returns the ThreadPoolRefreshBackend shared by all feeds.
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = ThreadPoolRefreshBackend()
+        return _default_backend
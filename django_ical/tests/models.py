@@ -0,0 +1,9 @@
+from django.db import models
+
+
+class Event(models.Model):
+    title = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField(null=True)
+    updated = models.DateTimeField(null=True)
@@ -0,0 +1,154 @@
+from contextlib import redirect_stdout
+from io import BytesIO
+from io import StringIO
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+from django.test.client import RequestFactory
+
+import icalendar
+
+from django_ical.diff import Difference
+from django_ical.diff import diff_calendars
+from django_ical.diff import main
+from django_ical.tests.test_feed import TestItemsFeed
+
+FIRST = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+PRODID:-//test//EN\r
+BEGIN:VEVENT\r
+UID:1\r
+SUMMARY:Meeting\r
+DTSTAMP:20240101T000000Z\r
+DTSTART;TZID=Europe/Berlin;VALUE=DATE-TIME:20240102T100000\r
+BEGIN:VALARM\r
+ACTION:DISPLAY\r
+TRIGGER:-PT15M\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:1\r
+RECURRENCE-ID:20240109T100000\r
+SUMMARY:Moved meeting\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:2\r
+SUMMARY:Lunch\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+# Reordered, refolded, with other parameter order and DTSTAMP
+SECOND = b"""BEGIN:VCALENDAR\r
+PRODID:-//test//EN\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+SUMMARY:Lunch\r
+UID:2\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:1\r
+RECURRENCE-ID:20240109T100000\r
+SUMMARY:Moved \r
+ meeting\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+DTSTAMP:20240301T000000Z\r
+BEGIN:VALARM\r
+TRIGGER:-PT15M\r
+ACTION:DISPLAY\r
+END:VALARM\r
+DTSTART;VALUE=DATE-TIME;TZID=Europe/Berlin:20240102T100000\r
+summary:Meeting\r
+UID:1\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class DiffTest(SimpleTestCase):
+    def test_equivalent(self):
+        self.assertEqual(list(diff_calendars(FIRST, SECOND)), [])
+
+    def test_changes(self):
+        changed = (
+            SECOND.replace(b"summary:Meeting", b"SUMMARY:Standup")
+            .replace(b"UID:2", b"UID:3")
+            .replace(b"TRIGGER:-PT15M", b"TRIGGER:-PT5M")
+        )
+        differences = list(diff_calendars(FIRST, changed))
+
+        self.assertEqual(
+            [(d.kind, d.key) for d in differences],
+            [
+                ("added", ("VEVENT", "3", None)),
+                ("changed", ("VEVENT", "1", None)),
+                ("removed", ("VEVENT", "2", None)),
+            ],
+        )
+        self.assertEqual(differences[0].added, ("SUMMARY:Lunch", "UID:3"))
+        self.assertEqual(
+            differences[1].removed,
+            ("SUMMARY:Meeting", "VALARM:ACTION:DISPLAY\nTRIGGER:-PT15M"),
+        )
+        self.assertEqual(
+            differences[1].added,
+            ("SUMMARY:Standup", "VALARM:ACTION:DISPLAY\nTRIGGER:-PT5M"),
+        )
+
+    def test_duplicate_keys(self):
+        first = (
+            b"BEGIN:VCALENDAR\r\n"
+            b"BEGIN:VEVENT\r\nSUMMARY:Lunch\r\nEND:VEVENT\r\n"
+            b"BEGIN:VEVENT\r\nSUMMARY:Dinner\r\nEND:VEVENT\r\n"
+            b"BEGIN:VEVENT\r\nSUMMARY:Dinner\r\nEND:VEVENT\r\n"
+            b"END:VCALENDAR\r\n"
+        )
+        second = (
+            b"BEGIN:VCALENDAR\r\n"
+            b"BEGIN:VEVENT\r\nSUMMARY:Dinner\r\nEND:VEVENT\r\n"
+            b"BEGIN:VEVENT\r\nSUMMARY:Breakfast\r\nEND:VEVENT\r\n"
+            b"END:VCALENDAR\r\n"
+        )
+        key = ("VEVENT", None, None)
+        self.assertEqual(
+            list(diff_calendars(first, second)),
+            [
+                Difference(key, "changed", ("SUMMARY:Lunch",), ("SUMMARY:Breakfast",)),
+                Difference(key, "removed", ("SUMMARY:Dinner",), ()),
+            ],
+        )
+        self.assertEqual(list(diff_calendars(first, first)), [])
+
+    def test_ignore(self):
+        differences = list(diff_calendars(FIRST, SECOND, ignore=()))
+        self.assertEqual(len(differences), 1)
+        self.assertEqual(differences[0].removed, ("DTSTAMP:20240101T000000Z",))
+        self.assertEqual(differences[0].added, ("DTSTAMP:20240301T000000Z",))
+
+    def test_rendered_feed(self):
+        request = RequestFactory().get("/test/ical")
+        content = TestItemsFeed()(request).content
+        reserialized = icalendar.Calendar.from_ical(content).to_ical()
+        self.assertNotEqual(content, reserialized)
+        self.assertEqual(list(diff_calendars(BytesIO(content), reserialized)), [])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = os.path.join(directory, "first.ics")
+            second = os.path.join(directory, "second.ics")
+            with open(first, "wb") as outfile:
+                outfile.write(FIRST)
+            with open(second, "wb") as outfile:
+                outfile.write(SECOND.replace(b"Lunch", b"Dinner"))
+
+            output = StringIO()
+            with redirect_stdout(output):
+                self.assertEqual(main([first, first]), 0)
+                self.assertEqual(main([first, second]), 1)
+
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            ["changed VEVENT 2 None", "- SUMMARY:Lunch", "+ SUMMARY:Dinner"],
+        )
@@ -1,17 +1,44 @@
 from datetime import date
 from datetime import datetime
 from datetime import timedelta
+import gc
+from io import BytesIO
 from os import linesep
+import threading
+import tracemalloc
+import weakref
 
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.http import Http404
 from django.test import TestCase
+from django.test import override_settings
 from django.test.client import RequestFactory
+from django.utils import translation
 
 from dateutil import tz
 import icalendar
+import recurrence
 
 from django_ical import utils
+from django_ical import views
+from django_ical.diff import diff_calendars
+from django_ical.debug import QueryBudgetExceeded
+from django_ical.feedgenerator import AlarmTemplate
+from django_ical.feedgenerator import CHUNK_SIZE
+from django_ical.feedgenerator import ContentLineWriter
+from django_ical.feedgenerator import DETERMINISTIC_TIMESTAMP
 from django_ical.feedgenerator import ICal20Feed
+from django_ical.feedgenerator import ICalendarSerializer
+from django_ical.feedgenerator import Serializer
+from django_ical.feedgenerator import calendar_header
+from django_ical.occurrences import OccurrenceIndex
+from django_ical.refresh import RefreshBackend
+from django_ical.tests.models import Event
 from django_ical.views import ICalFeed
+from django_ical.views import ICalFreeBusyFeed
+from django_ical.views import ICalMergedFeed
 
 
 class TestICalFeed(ICalFeed):
@@ -417,6 +444,56 @@ class ICal20FeedTest(TestCase):
             calendar.subcomponents[2]["PERCENT-COMPLETE"].to_ical(), b"89"
         )
 
+    def test_recurrence_rule(self):
+        rule = utils.RecurrenceRule("WEEKLY", byday=["MO", "FR"])
+
+        class TestRuleFeed(TestItemsFeed):
+            def item_rrule(self, obj):
+                return [rule, utils.RecurrenceRule("MONTHLY", bymonthday=4)]
+
+            def item_exrule(self, obj):
+                return rule
+
+        request = RequestFactory().get("/test/ical")
+        response = TestRuleFeed()(request)
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(
+            [r.to_ical() for r in calendar.subcomponents[0]["RRULE"]],
+            [b"FREQ=WEEKLY;BYDAY=MO,FR", b"FREQ=MONTHLY;BYMONTHDAY=4"],
+        )
+        self.assertEqual(
+            calendar.subcomponents[0]["EXRULE"].to_ical(), b"FREQ=WEEKLY;BYDAY=MO,FR"
+        )
+
+    def test_item_recurrence(self):
+        class TestRecurrenceFeed(TestItemsFeed):
+            item_rrule = item_rdate = item_exdate = None
+
+            def item_recurrence(self, obj):
+                return recurrence.Recurrence(
+                    rrules=[recurrence.Rule(recurrence.WEEKLY)],
+                    exrules=[recurrence.Rule(recurrence.MONTHLY, bymonthday=[1])],
+                    rdates=[
+                        datetime(2012, 5, 2, 10, 0, tzinfo=tz.UTC),
+                        datetime(2012, 5, 3, 10, 0, tzinfo=tz.UTC),
+                    ],
+                    exdates=[date(2012, 5, 9)],
+                )
+
+            def item_exrule(self, obj):
+                return utils.RecurrenceRule("DAILY", count=2)
+
+        request = RequestFactory().get("/test/ical")
+        response = TestRecurrenceFeed()(request)
+        self.assertIn(b"RDATE:20120502T100000Z,20120503T100000Z\r\n", response.content)
+        self.assertIn(b"EXDATE;VALUE=DATE:20120509\r\n", response.content)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        event = calendar.subcomponents[0]
+        self.assertEqual(event["RRULE"].to_ical(), b"FREQ=WEEKLY")
+        # item_exrule takes precedence over the recurrence
+        self.assertEqual(event["EXRULE"].to_ical(), b"FREQ=DAILY;COUNT=2")
+
     def test_wr_timezone(self):
         """
         Test for the x-wr-timezone property.
@@ -518,3 +595,1561 @@ class ICal20FeedTest(TestCase):
         response = view(request)
         header = b"BEGIN:VCALENDAR\r\nVERSION:2.0"
         self.assertTrue(response.content.startswith(header))
+
+    def test_cached_header(self):
+        request = RequestFactory().get("/test/ical")
+        view = TestFilenameFeed()
+        calendar_header.cache_clear()
+
+        first = view(request).content
+        second = view(request).content
+        header = calendar_header.__wrapped__(
+            (None, "PUBLISH", "Test Filename Feed", "Test ICal Feed", None, None),
+            "utf-8",
+        )
+        self.assertTrue(first.startswith(header))
+        self.assertTrue(second.startswith(header))
+        self.assertEqual(calendar_header.cache_info().hits, 1)
+        self.assertTrue(first.endswith(b"END:VEVENT\r\nEND:VCALENDAR\r\n"))
+
+    def test_stable_timestamp(self):
+        request = RequestFactory().get("/test/ical")
+        view = TestItemsFeed()
+
+        first = view(request).content
+        self.assertEqual(first, view(request).content)
+
+        calendar = icalendar.Calendar.from_ical(first)
+        for component in calendar.subcomponents:
+            self.assertEqual(
+                component["DTSTAMP"].to_ical(), component["LAST-MODIFIED"].to_ical()
+            )
+
+    def test_render_timestamp(self):
+        class TestTimestampFeed(TestFilenameFeed):
+            timestamp = datetime(2012, 5, 1, 10, 0)
+
+            def items(self, obj):
+                return [obj, obj]
+
+        request = RequestFactory().get("/test/ical")
+        calendar = icalendar.Calendar.from_ical(TestTimestampFeed()(request).content)
+        self.assertEqual(
+            [c["DTSTAMP"].dt.replace(tzinfo=None) for c in calendar.subcomponents],
+            [datetime(2012, 5, 1, 10, 0), datetime(2012, 5, 1, 10, 0)],
+        )
+
+    def test_item_timestamp(self):
+        class TestTimestampFeed(TestItemsFeed):
+            def item_timestamp(self, item):
+                return datetime(2012, 5, 1, 10, 0)
+
+        request = RequestFactory().get("/test/ical")
+        calendar = icalendar.Calendar.from_ical(TestTimestampFeed()(request).content)
+        self.assertEqual(
+            calendar.subcomponents[0]["DTSTAMP"].dt.replace(tzinfo=None),
+            datetime(2012, 5, 1, 10, 0),
+        )
+
+    def test_static_feed_fields(self):
+        class TestMethodFeed(TestICalFeed):
+            product_id = "-//example.com//Example//EN"
+
+            def method(self, obj):
+                return "REQUEST"
+
+        request = RequestFactory().get("/test/ical")
+        calendar = icalendar.Calendar.from_ical(TestMethodFeed()(request).content)
+        self.assertEqual(calendar["PRODID"], "-//example.com//Example//EN")
+        self.assertEqual(calendar["METHOD"], "REQUEST")
+
+        calendar = icalendar.Calendar.from_ical(TestICalFeed()(request).content)
+        self.assertEqual(calendar["METHOD"], "PUBLISH")
+
+        view = TestICalFeed()
+        view.method = "CANCEL"
+        calendar = icalendar.Calendar.from_ical(view(request).content)
+        self.assertEqual(calendar["METHOD"], "CANCEL")
+
+    def test_dynamic_feed_attributes(self):
+        class TestPropertyFeed(TestICalFeed):
+            @property
+            def timezone(self):
+                return "Asia/Tokyo"
+
+            def method(self, obj):
+                return super().method(obj).lower()
+
+        request = RequestFactory().get("/test/ical")
+        calendar = icalendar.Calendar.from_ical(TestPropertyFeed()(request).content)
+        self.assertEqual(calendar["X-WR-TIMEZONE"], "Asia/Tokyo")
+        self.assertEqual(calendar["METHOD"], "publish")
+
+    def test_argument_counts_cached(self):
+        class TestCountedFeed(TestItemsFeed):
+            def item_location(self, item):
+                return "Room"
+
+        request = RequestFactory().get("/test/ical")
+        TestCountedFeed()(request)
+        first = views._count_cached_args.cache_info()
+        feed = TestCountedFeed()
+        feed(request)
+        second = views._count_cached_args.cache_info()
+        self.assertGreater(second.hits, first.hits)
+        self.assertEqual(second.misses, first.misses)
+        # The cache doesn't keep feed instances alive.
+        feed = weakref.ref(feed)
+        gc.collect()
+        self.assertIsNone(feed())
+
+
+class TestQueryFeed(TestFilenameFeed):
+    debug_queries = True
+
+    def items(self):
+        return [{"id": i} for i in range(5)]
+
+    def item_title(self, item):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return "Item %d" % item["id"]
+
+    def item_description(self, item):
+        return ""
+
+
+class QueryInstrumentationTest(TestCase):
+    def test_counts_queries_per_accessor(self):
+        request = RequestFactory().get("/test/ical")
+
+        with self.assertLogs("django_ical.debug", "WARNING") as logs:
+            response = TestQueryFeed()(request)
+
+        recorder = response.query_recorder
+        self.assertEqual(recorder.queries["item_title"], 5)
+        self.assertEqual(recorder.total, 5)
+        self.assertEqual(recorder.scaling_accessors(), ["item_title"])
+        self.assertIn(
+            "TestQueryFeed.item_title ran 5 queries for 5 items", logs.output[0]
+        )
+
+    def test_query_budget(self):
+        class TestBudgetFeed(TestQueryFeed):
+            query_budget = 2
+
+        request = RequestFactory().get("/test/ical")
+        with self.assertRaises(QueryBudgetExceeded):
+            TestBudgetFeed()(request)
+
+    def test_disabled_by_default(self):
+        request = RequestFactory().get("/test/ical")
+        response = TestFilenameFeed()(request)
+        self.assertFalse(hasattr(response, "query_recorder"))
+
+
+class TestCachedFeed(TestFilenameFeed):
+    cache_timeout = 60
+    render_poll_interval = 0.01
+    renders = 0
+    rendering = None
+    release = None
+
+    def items(self):
+        TestCachedFeed.renders += 1
+        if self.rendering is not None:
+            self.rendering.set()
+            self.release.wait(5)
+        return [{"id": 1}]
+
+    def item_title(self, item):
+        return "Item %d" % item["id"]
+
+    def item_description(self, item):
+        return ""
+
+
+class TestRefreshBackend(RefreshBackend):
+    tasks = []
+
+    def enqueue(self, task):
+        self.tasks.append(task)
+        # Tasks are run in another thread, like in a worker.
+        thread = threading.Thread(target=task.run)
+        thread.start()
+        thread.join(5)
+
+
+class TestStaleFeed(TestCachedFeed):
+    cache_timeout = 0
+    stale_timeout = 60
+    refresh_backend = TestRefreshBackend()
+
+    def title(self):
+        return "Test Stale Feed (%s)" % translation.get_language()
+
+
+class CachingTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        TestCachedFeed.renders = 0
+        TestRefreshBackend.tasks = []
+
+    def test_cached(self):
+        request = RequestFactory().get("/test/ical")
+        first = TestCachedFeed()(request)
+        second = TestCachedFeed()(request)
+        self.assertEqual(TestCachedFeed.renders, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertEqual(
+            second["Content-Disposition"], 'attachment; filename="123.ics"'
+        )
+
+        TestCachedFeed()(RequestFactory().get("/test/ical?other"))
+        self.assertEqual(TestCachedFeed.renders, 2)
+
+    def test_disabled_by_default(self):
+        class TestUncachedFeed(TestCachedFeed):
+            cache_timeout = None
+
+        request = RequestFactory().get("/test/ical")
+        TestUncachedFeed()(request)
+        TestUncachedFeed()(request)
+        self.assertEqual(TestCachedFeed.renders, 2)
+
+    def test_coalesced(self):
+        class TestBlockingFeed(TestCachedFeed):
+            rendering = threading.Event()
+            release = threading.Event()
+
+        request = RequestFactory().get("/test/ical")
+        responses = []
+
+        def get():
+            responses.append(TestBlockingFeed()(request))
+
+        threads = [threading.Thread(target=get)]
+        threads[0].start()
+        self.assertTrue(TestBlockingFeed.rendering.wait(5))
+        threads += [threading.Thread(target=get) for _ in range(3)]
+        for thread in threads[1:]:
+            thread.start()
+        TestBlockingFeed.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(TestCachedFeed.renders, 1)
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(len({response.content for response in responses}), 1)
+
+    def test_lock_timeout(self):
+        class TestTimeoutFeed(TestCachedFeed):
+            render_lock_timeout = 0.05
+
+        request = RequestFactory().get("/test/ical")
+        view = TestTimeoutFeed()
+        caches["default"].add(view.get_cache_key(None, request) + ".lock", True)
+        view(request)
+        self.assertEqual(TestCachedFeed.renders, 1)
+
+    def test_cached_before_lock(self):
+        request = RequestFactory().get("/test/ical")
+        view = TestCachedFeed()
+        view(request)
+        # A request that missed the cache before the render released the
+        # lock doesn't render the feed again.
+        key = view.get_cache_key(None, request)
+        self.assertIsNone(view.refresh_cache(None, request, key=key, missing_only=True))
+        self.assertEqual(TestCachedFeed.renders, 1)
+        self.assertIsNone(caches["default"].get(key + ".lock"))
+
+    def test_expired_lock(self):
+        class TestSlowFeed(TestCachedFeed):
+            def items(self):
+                # The lock expired and another render took it.
+                caches["default"].set(lock_key, "other")
+                return super().items()
+
+        request = RequestFactory().get("/test/ical")
+        lock_key = TestSlowFeed().get_cache_key(None, request) + ".lock"
+        TestSlowFeed()(request)
+        self.assertEqual(caches["default"].get(lock_key), "other")
+
+    def test_wait_timeout(self):
+        class TestWaitFeed(TestCachedFeed):
+            render_wait_timeout = 0.05
+
+        request = RequestFactory().get("/test/ical")
+        view = TestWaitFeed()
+        caches["default"].add(view.get_cache_key(None, request) + ".lock", True)
+        view(request)
+        self.assertEqual(TestCachedFeed.renders, 1)
+
+    def test_per_user(self):
+        class User:
+            is_authenticated = True
+
+            def __init__(self, pk):
+                self.pk = pk
+
+        requests = [RequestFactory().get("/test/ical") for _ in range(3)]
+        requests[0].user = User(1)
+        requests[1].user = User(2)
+        for request in requests + requests:
+            TestCachedFeed()(request)
+        self.assertEqual(TestCachedFeed.renders, 3)
+
+    def test_stale(self):
+        request = RequestFactory().get("/test/ical")
+        first = TestStaleFeed()(request)
+        self.assertEqual(TestCachedFeed.renders, 1)
+        self.assertEqual(TestRefreshBackend.tasks, [])
+
+        second = TestStaleFeed()(request)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(TestCachedFeed.renders, 2)
+        (task,) = TestRefreshBackend.tasks
+        self.assertEqual(task.key, TestStaleFeed().get_cache_key(None, request))
+        self.assertEqual(task.feed, "django_ical.tests.test_feed.TestStaleFeed")
+        self.assertEqual(task.url, "http://testserver/test/ical")
+
+    def test_stale_language(self):
+        request = RequestFactory().get("/test/ical")
+        with translation.override("fr"):
+            TestStaleFeed()(request)
+            key = TestStaleFeed().get_cache_key(None, request)
+            caches["default"].delete(key)
+            TestStaleFeed()(request)
+            TestStaleFeed()(request)
+        (task,) = TestRefreshBackend.tasks
+        self.assertEqual(task.language, "fr")
+        self.assertEqual(task.key, key)
+        # The refresh ran in another thread and rendered the French feed.
+        self.assertEqual(TestCachedFeed.renders, 3)
+        self.assertIn(b"(fr)", caches["default"].get(key)[0])
+
+
+class RangeTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.full = TestCachedFeed()(RequestFactory().get("/test/ical"))
+
+    def get(self, **headers):
+        meta = {"HTTP_" + header.upper(): value for header, value in headers.items()}
+        return TestCachedFeed()(RequestFactory().get("/test/ical", **meta))
+
+    def test_etag(self):
+        self.assertTrue(self.full["ETag"].startswith('"'))
+        self.assertEqual(self.full["Accept-Ranges"], "bytes")
+        self.assertEqual(self.get()["ETag"], self.full["ETag"])
+
+    def test_range(self):
+        length = len(self.full.content)
+        response = self.get(range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.full.content[10:20])
+        self.assertEqual(response["Content-Range"], "bytes 10-19/%d" % length)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+
+        response = self.get(range="bytes=100-")
+        self.assertEqual(response.content, self.full.content[100:])
+
+        response = self.get(range="bytes=-15")
+        self.assertEqual(response.content, self.full.content[-15:])
+        self.assertEqual(
+            response["Content-Range"],
+            "bytes %d-%d/%d" % (length - 15, length - 1, length),
+        )
+
+    def test_unsatisfiable(self):
+        response = self.get(range="bytes=100000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response["Content-Range"], "bytes */%d" % len(self.full.content)
+        )
+
+    def test_ignored_ranges(self):
+        for header in ("bytes=0-1,5-6", "lines=1-2", "bytes=5-1", "bytes=-"):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(response.content, self.full.content)
+
+    def test_if_range(self):
+        response = self.get(range="bytes=0-9", if_range=self.full["ETag"])
+        self.assertEqual(response.status_code, 206)
+
+        response = self.get(range="bytes=0-9", if_range='"changed"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.full.content)
+
+
+class TestModelFeed(ICalFeed):
+    title = "Test Model Feed"
+
+    def items(self):
+        return Event.objects.all()
+
+    def item_guid(self, item):
+        return "%d@example.com" % item.pk
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.description
+
+    def item_link(self, item):
+        return "/event/%d" % item.pk
+
+    def item_start_datetime(self, item):
+        return item.start_datetime
+
+    def item_end_datetime(self, item):
+        return item.end_datetime
+
+
+class PaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Event.objects.create(
+                title="Event %d" % i,
+                start_datetime=datetime(2012, 5, i + 1, 10, 0, tzinfo=tz.UTC),
+            )
+
+    def get_summaries(self, view, path):
+        response = view(RequestFactory().get(path))
+        calendar = icalendar.Calendar.from_ical(response.content)
+        return [str(component["SUMMARY"]) for component in calendar.subcomponents]
+
+    def test_pages(self):
+        class TestPaginatedFeed(TestModelFeed):
+            paginate_by = 2
+
+        view = TestPaginatedFeed()
+        response = view(RequestFactory().get("/test/ical", {"pages": ""}))
+        self.assertEqual(response["Content-Type"], "text/uri-list; charset=utf-8")
+        urls = response.content.decode().split()
+        self.assertEqual(len(urls), 3)
+        self.assertEqual(urls[0], "http://testserver/test/ical")
+
+        pages = [self.get_summaries(view, url) for url in urls]
+        self.assertEqual(
+            pages,
+            [["Event 0", "Event 1"], ["Event 2", "Event 3"], ["Event 4"]],
+        )
+
+    def test_stable_urls(self):
+        class TestPaginatedFeed(TestModelFeed):
+            paginate_by = 2
+
+        view = TestPaginatedFeed()
+        response = view(RequestFactory().get("/test/ical", {"pages": ""}))
+        urls = response.content.decode().split()
+
+        Event.objects.filter(title="Event 0").delete()
+        self.assertEqual(self.get_summaries(view, urls[1]), ["Event 2", "Event 3"])
+
+    def test_exact_pages(self):
+        class TestPaginatedFeed(TestModelFeed):
+            paginate_by = 5
+
+        response = TestPaginatedFeed()(RequestFactory().get("/test/ical?pages"))
+        self.assertEqual(len(response.content.decode().split()), 1)
+
+    def test_invalid_page(self):
+        class TestPaginatedFeed(TestModelFeed):
+            paginate_by = 2
+
+        with self.assertRaises(Http404):
+            TestPaginatedFeed()(RequestFactory().get("/test/ical", {"after": "abc"}))
+
+    def test_requires_queryset(self):
+        class TestPaginatedFeed(TestItemsFeed):
+            paginate_by = 2
+
+        with self.assertRaises(ImproperlyConfigured):
+            TestPaginatedFeed()(RequestFactory().get("/test/ical"))
+
+
+class TestVersionedFeed(TestModelFeed):
+    streaming = True
+
+    def versions(self):
+        return Event.objects.order_by("pk").values_list("pk", "updated")
+
+
+class ETagTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Event.objects.create(
+                title="Event %d" % i,
+                start_datetime=datetime(2012, 5, i + 1, 10, 0, tzinfo=tz.UTC),
+            )
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def get(self, view, **meta):
+        return view(RequestFactory().get("/test/ical", **meta))
+
+    def test_streaming_etag(self):
+        response = self.get(TestVersionedFeed())
+        self.assertTrue(response.streaming)
+        etag = response["ETag"]
+        self.assertEqual(self.get(TestVersionedFeed())["ETag"], etag)
+
+        Event.objects.filter(title="Event 1").update(
+            updated=datetime(2012, 6, 1, tzinfo=tz.UTC)
+        )
+        self.assertNotEqual(self.get(TestVersionedFeed())["ETag"], etag)
+
+    def test_not_modified(self):
+        etag = self.get(TestVersionedFeed())["ETag"]
+
+        # Only the versions query runs.
+        with self.assertNumQueries(1):
+            response = self.get(TestVersionedFeed(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.get(TestVersionedFeed(), HTTP_IF_NONE_MATCH="W/" + etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.get(TestVersionedFeed(), HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached(self):
+        class TestCachedVersionedFeed(TestVersionedFeed):
+            streaming = False
+            cache_timeout = 60
+
+        view = TestCachedVersionedFeed()
+        first = self.get(view)
+        etag = view.get_etag(None, RequestFactory().get("/test/ical"))
+        self.assertEqual(first["ETag"], etag)
+
+        Event.objects.filter(title="Event 1").update(title="Changed")
+        second = self.get(TestCachedVersionedFeed())
+        # The versions didn't change, the cached feed is served.
+        self.assertEqual(second.content, first.content)
+
+        Event.objects.filter(title="Changed").update(
+            updated=datetime(2012, 6, 1, tzinfo=tz.UTC)
+        )
+        third = self.get(TestCachedVersionedFeed())
+        self.assertIn(b"SUMMARY:Changed", third.content)
+        self.assertNotEqual(third["ETag"], first["ETag"])
+
+    def test_without_versions(self):
+        self.assertNotIn("ETag", self.get(TestModelFeed()))
+
+
+class TestSlimFeed(TestModelFeed):
+    item_fields = {
+        "pk": "pk",
+        "title": "title",
+        "description": "description",
+        "start_datetime": "start_datetime",
+        "end_datetime": "end_datetime",
+    }
+
+    def item_guid(self, item):
+        return "%d@example.com" % item["pk"]
+
+    def item_link(self, item):
+        return "/event/%d" % item["pk"]
+
+
+class SlimItemsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Event.objects.create(
+                title="Event %d" % i,
+                description="Description %d" % i,
+                start_datetime=datetime(2012, 5, i + 1, 10, 0, tzinfo=tz.UTC),
+                end_datetime=datetime(2012, 5, i + 1, 12, 0, tzinfo=tz.UTC),
+            )
+
+    def get_calendar(self, view, path="/test/ical"):
+        response = view(RequestFactory().get(path))
+        return icalendar.Calendar.from_ical(response.content)
+
+    def test_same_output(self):
+        class TestTimestampFeed(TestModelFeed):
+            timestamp = datetime(2012, 1, 1, tzinfo=tz.UTC)
+
+        class TestSlimTimestampFeed(TestSlimFeed):
+            timestamp = datetime(2012, 1, 1, tzinfo=tz.UTC)
+
+        self.assertEqual(
+            self.get_calendar(TestSlimTimestampFeed()).to_ical(),
+            self.get_calendar(TestTimestampFeed()).to_ical(),
+        )
+
+    def test_skips_accessors(self):
+        class TestAccessorFeed(TestSlimFeed):
+            def item_title(self, item):
+                raise AssertionError("item_title called")
+
+            def item_start_datetime(self, item):
+                raise AssertionError("item_start_datetime called")
+
+        with self.assertNumQueries(1):
+            calendar = self.get_calendar(TestAccessorFeed())
+        self.assertEqual(
+            [str(event["SUMMARY"]) for event in calendar.subcomponents],
+            ["Event 0", "Event 1", "Event 2"],
+        )
+
+    def test_computed_fields(self):
+        class TestComputedFeed(TestSlimFeed):
+            item_location = "Tokyo"
+
+            def item_status(self, item):
+                return "CONFIRMED" if item["pk"] % 2 else "TENTATIVE"
+
+        calendar = self.get_calendar(TestComputedFeed())
+        pks = Event.objects.order_by("pk").values_list("pk", flat=True)
+        for pk, event in zip(pks, calendar.subcomponents):
+            self.assertEqual(event["UID"], "%d@example.com" % pk)
+            self.assertEqual(event["URL"], "http://testserver/event/%d" % pk)
+            self.assertEqual(event["LOCATION"], "Tokyo")
+            self.assertEqual(event["STATUS"], "CONFIRMED" if pk % 2 else "TENTATIVE")
+
+    def test_paginated(self):
+        class TestPaginatedSlimFeed(TestSlimFeed):
+            paginate_by = 2
+
+        calendar = self.get_calendar(TestPaginatedSlimFeed())
+        self.assertEqual(
+            [str(event["SUMMARY"]) for event in calendar.subcomponents],
+            ["Event 0", "Event 1"],
+        )
+
+    def test_requires_queryset(self):
+        class TestListFeed(TestSlimFeed):
+            def items(self):
+                return list(Event.objects.all())
+
+        with self.assertRaises(ImproperlyConfigured):
+            TestListFeed()(RequestFactory().get("/test/ical"))
+
+
+class RenderBudgetTest(TestCase):
+    def get(self, view):
+        return view(RequestFactory().get("/test/ical"))
+
+    def test_max_items(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_items = 2
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING") as logs:
+            response = self.get(TestBudgetFeed())
+        self.assertEqual(response["X-ICal-Truncated"], "items")
+        self.assertIn("after 2 components", logs.output[0])
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(len(calendar.subcomponents), 2)
+        self.assertEqual(calendar["X-DJANGO-ICAL-TRUNCATED"], "items")
+
+    def test_recorded_queries(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_items = 1
+            debug_queries = True
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = self.get(TestBudgetFeed())
+        self.assertEqual(response["X-ICal-Truncated"], "items")
+        # Items past the budget aren't read while queries are recorded.
+        self.assertEqual(response.query_recorder.calls["item_title"], 2)
+
+    def test_truncated_chunks(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_items = 2
+
+        feedgen = TestBudgetFeed().get_feed(None, RequestFactory().get("/test/ical"))
+        chunks = []
+
+        class ChunkFile:
+            write = chunks.append
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            feedgen.write(ChunkFile(), "utf-8")
+        calendar = icalendar.Calendar.from_ical(b"".join(chunks))
+        self.assertEqual(calendar["X-DJANGO-ICAL-TRUNCATED"], "items")
+        self.assertEqual(len(calendar.subcomponents), 2)
+
+    def test_within_budget(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_items = 3
+            max_bytes = 64 * 1024
+            max_render_time = 60
+
+        response = self.get(TestBudgetFeed())
+        self.assertNotIn("X-ICal-Truncated", response)
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(len(calendar.subcomponents), 3)
+        self.assertNotIn("X-DJANGO-ICAL-TRUNCATED", calendar)
+
+    def test_max_bytes(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_bytes = 1
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = self.get(TestBudgetFeed())
+        self.assertEqual(response["X-ICal-Truncated"], "bytes")
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(calendar.subcomponents, [])
+
+    def test_max_render_time(self):
+        class TestBudgetFeed(TestItemsFeed):
+            max_render_time = 0
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = self.get(TestBudgetFeed())
+        self.assertEqual(response["X-ICal-Truncated"], "time")
+
+    def test_unbounded_items(self):
+        produced = [0]
+
+        class TestEndlessFeed(TestICalFeed):
+            max_items = 5
+
+            def items(self):
+                while True:
+                    produced[0] += 1
+                    yield produced[0]
+
+            def item_title(self, item):
+                return "Event %d" % item
+
+            def item_link(self, item):
+                return "/event/%d" % item
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = self.get(TestEndlessFeed())
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(len(calendar.subcomponents), 5)
+        self.assertEqual(produced[0], 6)
+
+    def test_streaming(self):
+        class TestBudgetFeed(TestItemsFeed):
+            streaming = True
+            max_items = 1
+
+        response = self.get(TestBudgetFeed())
+        self.assertNotIn("X-ICal-Truncated", response)
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            content = b"".join(response.streaming_content)
+        # The calendar is closed, only the header can't name the limit.
+        calendar = icalendar.Calendar.from_ical(content)
+        self.assertEqual(len(calendar.subcomponents), 1)
+        self.assertTrue(content.endswith(b"END:VCALENDAR\r\n"))
+
+
+class TestTeamFeed(ICalFeed):
+    def get_object(self, request, team="a"):
+        return team
+
+    def items(self, team):
+        return [("shared", "Standup"), (team, "Retro %s" % team)]
+
+    def item_title(self, item):
+        return item[1]
+
+    def item_link(self, item):
+        return "/event/%s" % item[0]
+
+    def item_start_datetime(self, item):
+        return datetime(2012, 5, 1, 10, 0)
+
+
+class TestMergedFeed(ICalMergedFeed):
+    title = "Merged"
+    timestamp = datetime(2012, 1, 1)
+
+    def get_feeds(self, obj, request):
+        return [(TestTeamFeed(), team) for team in ("a", "b", "c")]
+
+
+class MergedFeedTest(TestCase):
+    def get_calendar(self, view):
+        response = view(RequestFactory().get("/test/ical"))
+        return icalendar.Calendar.from_ical(response.content)
+
+    def test_merged(self):
+        calendar = self.get_calendar(TestMergedFeed())
+        self.assertEqual(calendar["X-WR-CALNAME"], "Merged")
+        self.assertEqual(
+            [str(event["SUMMARY"]) for event in calendar.subcomponents],
+            ["Standup", "Retro a", "Retro b", "Retro c"],
+        )
+        self.assertEqual(
+            [str(event["UID"]) for event in calendar.subcomponents],
+            [
+                "http://testserver/event/shared",
+                "http://testserver/event/a",
+                "http://testserver/event/b",
+                "http://testserver/event/c",
+            ],
+        )
+
+    def test_concurrent(self):
+        threads = set()
+
+        class TestThreadFeed(TestTeamFeed):
+            def items(self, team):
+                threads.add(threading.get_ident())
+                return super().items(team)
+
+        class TestConcurrentFeed(TestMergedFeed):
+            concurrent = True
+
+            def get_feeds(self, obj, request):
+                return [(TestThreadFeed(), team) for team in ("a", "b", "c")]
+
+        calendar = self.get_calendar(TestConcurrentFeed())
+        self.assertNotIn(threading.get_ident(), threads)
+        # The output doesn't depend on the order the feeds are read in.
+        self.assertEqual(
+            calendar.to_ical(), self.get_calendar(TestMergedFeed()).to_ical()
+        )
+
+    def test_concurrent_language(self):
+        class TestLanguageFeed(TestTeamFeed):
+            def item_title(self, item):
+                return "%s (%s)" % (item[1], translation.get_language())
+
+        class TestConcurrentFeed(TestMergedFeed):
+            concurrent = True
+
+            def get_feeds(self, obj, request):
+                return [(TestLanguageFeed(), team) for team in ("a", "b")]
+
+        with translation.override("fr"):
+            calendar = self.get_calendar(TestConcurrentFeed())
+        self.assertEqual(
+            [str(event["SUMMARY"]) for event in calendar.subcomponents],
+            ["Standup (fr)", "Retro a (fr)", "Retro b (fr)"],
+        )
+
+    def test_concurrent_budget(self):
+        produced = []
+
+        class TestLongFeed(TestTeamFeed):
+            def items(self, team):
+                for number in range(100):
+                    produced.append(team)
+                    yield ("%s%s" % (team, number), "Retro %s" % team)
+
+        class TestConcurrentFeed(TestMergedFeed):
+            concurrent = True
+            max_items = 2
+            stream_fetch_size = 1
+
+            def get_feeds(self, obj, request):
+                return [(TestLongFeed(), team) for team in ("a", "b")]
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            calendar = self.get_calendar(TestConcurrentFeed())
+        self.assertEqual(len(calendar.subcomponents), 2)
+        # The threads stop reading ahead of the render once it stops.
+        self.assertLess(produced.count("a"), 10)
+        self.assertLess(produced.count("b"), 10)
+
+    def test_concurrent_error(self):
+        class TestBrokenFeed(TestTeamFeed):
+            def items(self, team):
+                raise ValueError(team)
+
+        class TestConcurrentFeed(TestMergedFeed):
+            concurrent = True
+
+            def get_feeds(self, obj, request):
+                return [(TestTeamFeed(), "a"), (TestBrokenFeed(), "b")]
+
+        with self.assertRaisesMessage(ValueError, "b"):
+            self.get_calendar(TestConcurrentFeed())
+
+    def test_feeds_attribute(self):
+        class TestListedFeed(ICalMergedFeed):
+            feeds = [TestTeamFeed, TestItemsFeed()]
+
+            def get_object(self, request):
+                return "a"
+
+        calendar = self.get_calendar(TestListedFeed())
+        self.assertEqual(len(calendar.subcomponents), 5)
+
+
+class ThreadedAccessorTest(TestCase):
+    def test_threaded_accessors(self):
+        barrier = threading.Barrier(4, timeout=5)
+        calls = []
+
+        class TestThreadedFeed(TestICalFeed):
+            threaded_accessors = ("item_location",)
+            accessor_workers = 4
+            accessor_chunk_size = 4
+
+            def items(self):
+                return range(10)
+
+            def item_title(self, item):
+                return "Event %d" % item
+
+            def item_link(self, item):
+                return "/event/%d" % item
+
+            def item_location(self, item):
+                calls.append(item)
+                if item < 8:
+                    # Blocks unless the accessors of a chunk run concurrently.
+                    barrier.wait()
+                return "Room %d" % item
+
+        response = TestThreadedFeed()(RequestFactory().get("/test/ical"))
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(
+            [str(event["LOCATION"]) for event in calendar.subcomponents],
+            ["Room %d" % i for i in range(10)],
+        )
+        self.assertEqual(sorted(calls), list(range(10)))
+
+    def test_language(self):
+        class TestThreadedFeed(TestICalFeed):
+            threaded_accessors = ("item_location",)
+
+            def items(self):
+                return range(3)
+
+            def item_title(self, item):
+                return "Event %d" % item
+
+            def item_link(self, item):
+                return "/event/%d" % item
+
+            def item_location(self, item):
+                return translation.get_language()
+
+        with translation.override("fr"):
+            response = TestThreadedFeed()(RequestFactory().get("/test/ical"))
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(
+            [str(event["LOCATION"]) for event in calendar.subcomponents],
+            ["fr"] * 3,
+        )
+
+    def test_recorded_queries(self):
+        class TestThreadedFeed(TestICalFeed):
+            threaded_accessors = ("item_location",)
+            debug_queries = True
+
+            def items(self):
+                return range(3)
+
+            def item_title(self, item):
+                return "Event %d" % item
+
+            def item_link(self, item):
+                return "/event/%d" % item
+
+            def item_location(self, item):
+                return "Room %d" % Event.objects.count()
+
+        with self.assertLogs("django_ical.debug", "WARNING"):
+            response = TestThreadedFeed()(RequestFactory().get("/test/ical"))
+        self.assertEqual(response.query_recorder.queries["item_location"], 3)
+
+
+class ICalendarFeed(ICal20Feed):
+    serializer_class = ICalendarSerializer
+
+
+class TestSerializerFeed(ICal20Feed):
+    serializer_class = ContentLineWriter
+
+
+class SerializerTest(TestCase):
+    def get(self, view):
+        return view(RequestFactory().get("/test/ical"))
+
+    def test_icalendar_serializer(self):
+        class TestICalendarFeed(TestItemsFeed):
+            feed_type = ICalendarFeed
+
+        expected = self.get(TestItemsFeed()).content
+        content = self.get(TestICalendarFeed()).content
+        self.assertEqual(list(diff_calendars(expected, content)), [])
+
+    @override_settings(
+        DJANGO_ICAL_SERIALIZER="django_ical.feedgenerator.ICalendarSerializer"
+    )
+    def test_setting(self):
+        feed = ICal20Feed("Title", "/link", "Description")
+        self.assertIs(feed.get_serializer_class(), ICalendarSerializer)
+        # serializer_class overrides the setting.
+        feed = TestSerializerFeed("Title", "/link", "Description")
+        self.assertIs(feed.get_serializer_class(), ContentLineWriter)
+
+    def test_custom_serializer(self):
+        calls = []
+
+        class TestSerializer(Serializer):
+            def begin_calendar(self, feed):
+                calls.append("begin")
+                self.write_raw(b"BEGIN:VCALENDAR\r\n")
+
+            def write_component(self, component):
+                calls.append(component.name)
+                name = component.name.encode()
+                self.write_raw(b"BEGIN:%s\r\nEND:%s\r\n" % (name, name))
+
+            def end_calendar(self):
+                calls.append("end")
+                super().end_calendar()
+
+        class TestCustomSerializerFeed(ICal20Feed):
+            serializer_class = TestSerializer
+
+        class TestCustomFeed(TestItemsFeed):
+            feed_type = TestCustomSerializerFeed
+            max_items = 1
+
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = self.get(TestCustomFeed())
+        self.assertEqual(calls, ["begin", "VEVENT", "end"])
+        self.assertEqual(
+            response.content,
+            b"BEGIN:VCALENDAR\r\nX-DJANGO-ICAL-TRUNCATED:items\r\n"
+            b"BEGIN:VEVENT\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n",
+        )
+
+
+class TestFreeBusyFeed(ICalFreeBusyFeed):
+    freebusy_start = datetime(2012, 5, 1, tzinfo=tz.UTC)
+    freebusy_end = datetime(2012, 5, 8, tzinfo=tz.UTC)
+
+    def items(self):
+        return [
+            {
+                "start": datetime(2012, 5, 1, 10, 0, tzinfo=tz.UTC),
+                "end": datetime(2012, 5, 1, 12, 0, tzinfo=tz.UTC),
+                "rrule": utils.build_rrule(freq="DAILY", count=3),
+            },
+            {
+                "start": datetime(2012, 5, 2, 11, 0, tzinfo=tz.UTC),
+                "end": datetime(2012, 5, 2, 13, 0, tzinfo=tz.UTC),
+            },
+            {
+                "start": datetime(2012, 5, 7, 23, 0, tzinfo=tz.UTC),
+                "end": datetime(2012, 5, 8, 1, 0, tzinfo=tz.UTC),
+            },
+            {
+                "start": datetime(2012, 5, 5, 10, 0, tzinfo=tz.UTC),
+                "end": datetime(2012, 5, 5, 12, 0, tzinfo=tz.UTC),
+                "transparency": "TRANSPARENT",
+            },
+        ]
+
+    def item_start_datetime(self, item):
+        return item["start"]
+
+    def item_end_datetime(self, item):
+        return item["end"]
+
+    def item_rrule(self, item):
+        return item.get("rrule")
+
+    def item_transparency(self, item):
+        return item.get("transparency")
+
+
+class FreeBusyTest(TestCase):
+    def test_freebusy(self):
+        request = RequestFactory().get("/test/ical")
+        response = TestFreeBusyFeed()(request)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(len(calendar.subcomponents), 1)
+        freebusy = calendar.subcomponents[0]
+        self.assertEqual(freebusy.name, "VFREEBUSY")
+        self.assertEqual(freebusy["DTSTART"].to_ical(), b"20120501T000000Z")
+        self.assertEqual(freebusy["DTEND"].to_ical(), b"20120508T000000Z")
+        self.assertEqual(
+            [period.to_ical() for period in freebusy["FREEBUSY"]],
+            [
+                b"20120501T100000Z/20120501T120000Z",
+                b"20120502T100000Z/20120502T130000Z",
+                b"20120503T100000Z/20120503T120000Z",
+                b"20120507T230000Z/20120508T000000Z",
+            ],
+        )
+
+    def test_naive_items(self):
+        tomorrow = datetime.now().replace(microsecond=0) + timedelta(days=1)
+
+        class TestNaiveFeed(TestFreeBusyFeed):
+            # The window defaults to the aware now().
+            freebusy_start = ICalFreeBusyFeed.freebusy_start
+            freebusy_end = None
+
+            def items(self):
+                return [
+                    {"start": tomorrow, "end": tomorrow + timedelta(hours=1)},
+                    {"start": None, "end": tomorrow},
+                ]
+
+        request = RequestFactory().get("/test/ical")
+        response = TestNaiveFeed()(request)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        period = calendar.subcomponents[0]["FREEBUSY"]
+        # TIME_ZONE is UTC.
+        self.assertEqual(
+            period.to_ical(),
+            b"%s/%s"
+            % (
+                tomorrow.strftime("%Y%m%dT%H%M%SZ").encode(),
+                (tomorrow + timedelta(hours=1)).strftime("%Y%m%dT%H%M%SZ").encode(),
+            ),
+        )
+
+    def test_item_recurrence(self):
+        class TestRecurrenceFeed(TestFreeBusyFeed):
+            def items(self):
+                return super().items()[1:2]
+
+            def item_recurrence(self, item):
+                return recurrence.Recurrence(
+                    rdates=[datetime(2012, 5, 4, 11, 0, tzinfo=tz.UTC)]
+                )
+
+        request = RequestFactory().get("/test/ical")
+        response = TestRecurrenceFeed()(request)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(
+            [period.to_ical() for period in calendar.subcomponents[0]["FREEBUSY"]],
+            [
+                b"20120502T110000Z/20120502T130000Z",
+                b"20120504T110000Z/20120504T130000Z",
+            ],
+        )
+
+    def test_occurrence_index(self):
+        index = OccurrenceIndex(
+            TestFreeBusyFeed.freebusy_start, TestFreeBusyFeed.freebusy_end
+        )
+        index.add(
+            1,
+            datetime(2012, 5, 1, 10, 0, tzinfo=tz.UTC),
+            datetime(2012, 5, 1, 12, 0, tzinfo=tz.UTC),
+            rrule=utils.build_rrule(freq="WEEKLY"),
+        )
+
+        class TestIndexFeed(TestFreeBusyFeed):
+            occurrence_index = index
+
+            def items(self):
+                raise AssertionError("items are read from the index")
+
+        request = RequestFactory().get("/test/ical")
+        response = TestIndexFeed()(request)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        self.assertEqual(
+            calendar.subcomponents[0]["FREEBUSY"].to_ical(),
+            b"20120501T100000Z/20120501T120000Z",
+        )
+
+
+class ContentLineWriterTest(TestCase):
+    def write(self, component, **kwargs):
+        outfile = BytesIO()
+        writer = ContentLineWriter(outfile, **kwargs)
+        writer.write_component(component)
+        writer.flush()
+        return outfile.getvalue()
+
+    def test_matches_icalendar(self):
+        event = icalendar.Event()
+        event.add("summary", "Hello, World; again\\")
+        event.add("description", "Line 1\nLine 2")
+        event.add("dtstart", datetime(2012, 5, 1, 18, 0))
+        event.add("geo", (37.386013, -122.082932))
+        self.assertEqual(self.write(event), event.to_ical())
+
+    def test_folding(self):
+        event = icalendar.Event()
+        event.add("summary", "x" * 200)
+        event.add("description", "\u00e9" * 100 + "a\\b;c,d\n" * 20)
+        content = self.write(event)
+
+        for line in content.split(b"\r\n"):
+            self.assertLessEqual(len(line), 75)
+            line.decode("utf-8")  # multi-byte characters are never split
+
+        parsed = icalendar.Event.from_ical(content)
+        self.assertEqual(parsed["SUMMARY"], event["SUMMARY"])
+        self.assertEqual(parsed["DESCRIPTION"], event["DESCRIPTION"])
+
+    def test_chunks(self):
+        class ChunkFile:
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, data):
+                self.chunks.append(data)
+
+        calendar = icalendar.Calendar()
+        for i in range(100):
+            event = icalendar.Event()
+            event.add("summary", "Event %d" % i)
+            calendar.add_component(event)
+
+        outfile = ChunkFile()
+        writer = ContentLineWriter(outfile, chunk_size=256)
+        writer.write_component(calendar)
+        writer.flush()
+
+        self.assertGreater(len(outfile.chunks), 1)
+        self.assertTrue(all(len(chunk) < 256 + 75 for chunk in outfile.chunks))
+        self.assertEqual(b"".join(outfile.chunks), calendar.to_ical())
+
+
+class ComponentTypeTest(TestCase):
+    def feed(self):
+        return ICal20Feed("Title", "/link", "Description")
+
+    def calendar(self, feed):
+        outfile = BytesIO()
+        feed.write(outfile, "utf-8")
+        return icalendar.Calendar.from_ical(outfile.getvalue())
+
+    def test_mixed(self):
+        feed = self.feed()
+        feed.add_item(
+            "Meeting",
+            "/event",
+            "",
+            start_datetime=datetime(2012, 5, 1, 10, 0),
+            transparency="OPAQUE",
+        )
+        feed.add_item(
+            "Task",
+            "/todo",
+            "",
+            component_type="todo",
+            due=datetime(2012, 5, 2, 10, 0),
+        )
+        feed.add_item(
+            "Minutes",
+            "/journal",
+            "Notes",
+            component_type="journal",
+            start_datetime=date(2012, 5, 1),
+        )
+        feed.add_item(
+            "Busy",
+            "/busy",
+            "",
+            component_type="freebusy",
+            freebusy=[
+                (datetime(2012, 5, 1, 10, 0), datetime(2012, 5, 1, 11, 0)),
+            ],
+        )
+
+        calendar = self.calendar(feed)
+        self.assertEqual(
+            [component.name for component in calendar.subcomponents],
+            ["VEVENT", "VTODO", "VJOURNAL", "VFREEBUSY"],
+        )
+        journal = calendar.subcomponents[2]
+        self.assertEqual(journal["SUMMARY"], "Minutes")
+        self.assertEqual(journal["DESCRIPTION"], "Notes")
+        freebusy = calendar.subcomponents[3]
+        self.assertNotIn("SUMMARY", freebusy)
+        self.assertEqual(freebusy["URL"], "/busy")
+        self.assertEqual(
+            freebusy["FREEBUSY"].to_ical(), b"20120501T100000/20120501T110000"
+        )
+
+    def test_invalid_fields(self):
+        feed = self.feed()
+        with self.assertRaisesMessage(
+            ValueError,
+            "VTODO doesn't support the item fields end_datetime, transparency",
+        ):
+            feed.add_item(
+                "Task",
+                "/todo",
+                "",
+                component_type="todo",
+                end_datetime=datetime(2012, 5, 2, 10, 0),
+                transparency="OPAQUE",
+            )
+        with self.assertRaises(ValueError):
+            feed.add_item(
+                "Minutes", "/journal", "", component_type="journal", valarm=[]
+            )
+        self.assertEqual(feed.items, [])
+
+    def test_unknown_type(self):
+        with self.assertRaisesMessage(ValueError, "Unknown component type 'meeting'"):
+            self.feed().add_item("Meeting", "/event", "", component_type="meeting")
+
+
+class TestComponentTypeFeed(TestICalFeed):
+    def items(self):
+        return [
+            {"title": "Meeting", "component_type": "event"},
+            {"title": "Busy", "component_type": "freebusy"},
+        ]
+
+    def item_component_type(self, item):
+        return item["component_type"]
+
+    def item_title(self, item):
+        return item["title"]
+
+    def item_description(self, item):
+        return ""
+
+    def item_link(self, item):
+        return "/%s" % item["component_type"]
+
+    def item_start_datetime(self, item):
+        return datetime(2012, 5, 1, 10, 0)
+
+    def item_duration(self, item):
+        if item["component_type"] == "event":
+            return timedelta(hours=2)
+        return None
+
+    def item_freebusy(self, item):
+        if item["component_type"] == "freebusy":
+            return [(datetime(2012, 5, 1, 10, 0), datetime(2012, 5, 1, 11, 0))]
+        return None
+
+
+class ComponentTypeFeedTest(TestCase):
+    def test_accessors(self):
+        request = RequestFactory().get("/test/ical")
+        response = TestComponentTypeFeed()(request)
+        event, freebusy = icalendar.Calendar.from_ical(response.content).walk()[1:]
+        self.assertEqual(event["DURATION"].dt, timedelta(hours=2))
+        self.assertEqual(
+            freebusy["FREEBUSY"].to_ical(), b"20120501T100000/20120501T110000"
+        )
+
+
+class TestDeterministicFeed(TestItemsFeed):
+    deterministic = True
+
+
+class TestShuffledFeed(TestDeterministicFeed):
+    def items(self):
+        items = super().items()[::-1]
+        items[-1]["participants"].reverse()
+        return items
+
+
+class DeterministicTest(TestCase):
+    def test_identical_bytes(self):
+        request = RequestFactory().get("/test/ical")
+        content = TestDeterministicFeed()(request).content
+        self.assertEqual(TestShuffledFeed()(request).content, content)
+
+        class TestUnsortedFeed(TestShuffledFeed):
+            deterministic = False
+
+        self.assertNotEqual(TestUnsortedFeed()(request).content, content)
+
+    def test_order(self):
+        request = RequestFactory().get("/test/ical")
+        calendar = icalendar.Calendar.from_ical(TestShuffledFeed()(request).content)
+        uids = [str(component["UID"]) for component in calendar.subcomponents]
+        self.assertEqual(uids, sorted(uids))
+        attendees = [str(a) for a in calendar.subcomponents[0]["ATTENDEE"]]
+        self.assertEqual(attendees, sorted(attendees))
+
+    def test_timestamp(self):
+        feed = ICal20Feed("Title", "/link", "", deterministic=True)
+        feed.add_item("First", "/1", "", updateddate=datetime(2012, 5, 1, 10, 0))
+        feed.add_item("Second", "/2", "", pubdate=datetime(2012, 5, 3, 10, 0))
+        feed.add_item("Third", "/3", "")
+
+        outfile = BytesIO()
+        feed.write(outfile, "utf-8")
+        calendar = icalendar.Calendar.from_ical(outfile.getvalue())
+        self.assertEqual(
+            [c["DTSTAMP"].dt.replace(tzinfo=None) for c in calendar.subcomponents],
+            [
+                datetime(2012, 5, 1, 10, 0),
+                datetime(2012, 5, 3, 10, 0),
+                datetime(2012, 5, 3, 10, 0),
+            ],
+        )
+
+    def test_timestamp_without_item_dates(self):
+        class TestUndatedFeed(TestDeterministicFeed):
+            def item_updateddate(self, obj):
+                return None
+
+            def item_pubdate(self, obj):
+                return None
+
+        request = RequestFactory().get("/test/ical")
+        content = TestUndatedFeed()(request).content
+        calendar = icalendar.Calendar.from_ical(content)
+        self.assertEqual(
+            {c["DTSTAMP"].dt for c in calendar.subcomponents},
+            {DETERMINISTIC_TIMESTAMP},
+        )
+        self.assertEqual(TestUndatedFeed()(request).content, content)
+
+
+class AlarmTemplateTest(TestCase):
+    def test_shared_alarms(self):
+        reminder = AlarmTemplate(
+            action="DISPLAY", trigger=timedelta(minutes=-15), description="Soon"
+        )
+
+        class TestAlarmFeed(TestItemsFeed):
+            item_valarm = (
+                reminder,
+                AlarmTemplate(action="AUDIO", trigger=timedelta(days=-1)),
+            )
+
+        request = RequestFactory().get("/test/ical")
+        response = TestAlarmFeed()(request)
+
+        calendar = icalendar.Calendar.from_ical(response.content)
+        for event in calendar.subcomponents:
+            alarms = event.subcomponents
+            self.assertEqual(
+                [alarm["ACTION"] for alarm in alarms], ["DISPLAY", "AUDIO"]
+            )
+            self.assertEqual(alarms[0]["TRIGGER"].to_ical(), b"-PT15M")
+            self.assertEqual(alarms[0]["DESCRIPTION"], "Soon")
+
+        self.assertIs(reminder.serialized("utf-8"), reminder.serialized("utf-8"))
+        self.assertEqual(response.content.count(reminder.serialized("utf-8")), 3)
+
+    def test_immutable(self):
+        reminder = AlarmTemplate(action="DISPLAY", trigger=timedelta(minutes=-15))
+        with self.assertRaises(TypeError):
+            reminder.add("description", "Changed")
+        with self.assertRaises(TypeError):
+            del reminder["ACTION"]
+        with self.assertRaises(TypeError):
+            reminder.add_component(icalendar.Alarm())
+
+    def test_required_properties(self):
+        with self.assertRaises(ValueError):
+            AlarmTemplate(action="DISPLAY")
+
+
+class StreamingTest(TestCase):
+    def test_iter_chunks(self):
+        feed = ICal20Feed(
+            "Title", "/link", "Description", timestamp=datetime(2012, 1, 1)
+        )
+        for i in range(2000):
+            feed.add_item("Event %d" % i, "/event/%d" % i, "x" * 100)
+
+        outfile = BytesIO()
+        feed.write(outfile, "utf-8")
+        chunks = list(feed.iter_chunks())
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        self.assertTrue(all(len(chunk) < CHUNK_SIZE + 1024 for chunk in chunks))
+        self.assertEqual(b"".join(chunks), outfile.getvalue())
+
+    def test_streaming_response(self):
+        class TestStreamingFeed(TestItemsFeed):
+            streaming = True
+
+        request = RequestFactory().get("/test/ical")
+        response = TestStreamingFeed()(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+
+        calendar = icalendar.Calendar.from_ical(b"".join(response.streaming_content))
+        self.assertEqual(len(calendar.subcomponents), 3)
+        self.assertEqual(calendar.subcomponents[0]["SUMMARY"], "Title1")
+
+    def test_last_modified(self):
+        class TestUpdatedFeed(TestItemsFeed):
+            def item_updateddate(self, item):
+                return datetime(2012, 5, 1, tzinfo=tz.UTC)
+
+        class TestStreamingUpdatedFeed(TestUpdatedFeed):
+            streaming = True
+
+        class TestBudgetFeed(TestItemsFeed):
+            max_items = 1
+
+        request = RequestFactory().get("/test/ical")
+        self.assertIn("Last-Modified", TestUpdatedFeed()(request))
+        # Items deferred by the render budget are read before the header is
+        # set, the item read and left out of the feed doesn't count.
+        with self.assertLogs("django_ical.feedgenerator", "WARNING"):
+            response = TestBudgetFeed()(request)
+        self.assertEqual(response["X-ICal-Truncated"], "items")
+        self.assertEqual(response["Last-Modified"], "Wed, 02 May 2012 10:00:00 GMT")
+        # The dates of the items aren't known before they are streamed.
+        self.assertNotIn("Last-Modified", TestStreamingUpdatedFeed()(request))
+
+    def test_backpressure(self):
+        produced = [0]
+
+        class TestLargeFeed(ICalFeed):
+            streaming = True
+            stream_high_water_mark = 16 * 1024
+            timestamp = datetime(2012, 1, 1)
+
+            def items(self):
+                for i in range(10000):
+                    produced[0] = i + 1
+                    yield i
+
+            def item_title(self, item):
+                return "Event %d" % item
+
+            def item_link(self, item):
+                return "/event/%d" % item
+
+            def item_start_datetime(self, item):
+                return datetime(2012, 5, 1, 10, 0)
+
+        response = TestLargeFeed()(RequestFactory().get("/test/ical"))
+        chunks = iter(response.streaming_content)
+
+        # Items are only read when the consumer asks for more.
+        first = next(chunks)
+        self.assertLessEqual(len(first), 16 * 1024 + 1024)
+        self.assertLess(produced[0], 1000)
+
+        tracemalloc.start()
+        try:
+            size = len(first)
+            count = first.count(b"BEGIN:VEVENT")
+            for chunk in chunks:
+                self.assertLessEqual(len(chunk), 16 * 1024 + 1024)
+                size += len(chunk)
+                count += chunk.count(b"BEGIN:VEVENT")
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(count, 10000)
+        self.assertGreater(size, 1024 * 1024)
+        # The peak doesn't grow with the size of the feed.
+        self.assertLess(peak, 1024 * 1024)
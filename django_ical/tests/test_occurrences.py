@@ -0,0 +1,91 @@
+"""Test the occurrence index."""
+
+import datetime
+
+from django.test import TestCase
+
+from django_ical import utils
+from django_ical.occurrences import OccurrenceIndex
+
+
+def dt(day, hour=0):
+    return datetime.datetime(2024, 1, day, hour)
+
+
+class OccurrenceIndexTest(TestCase):
+    """Test finding occurrences in a window."""
+
+    def setUp(self):
+        self.index = OccurrenceIndex(dt(1), dt(15))
+        self.index.add(
+            "daily", dt(1, 10), dt(1, 11), rrule=utils.build_rrule(freq="DAILY")
+        )
+        self.index.add("once", dt(3, 9), dt(3, 12))
+        self.index.add("long", dt(2), dt(9))
+
+    def test_between(self):
+        assert self.index.between(dt(3), dt(4)) == [
+            (dt(2), dt(9), "long"),
+            (dt(3, 9), dt(3, 12), "once"),
+            (dt(3, 10), dt(3, 11), "daily"),
+        ]
+
+    def test_keys_between(self):
+        assert self.index.keys_between(dt(10), dt(12)) == ["daily"]
+        assert self.index.keys_between(dt(1, 12), dt(1, 13)) == []
+
+    def test_update(self):
+        self.index.update("once", dt(10, 9), dt(10, 12))
+        assert self.index.keys_between(dt(3), dt(4)) == ["long", "daily"]
+        assert self.index.keys_between(dt(10), dt(11)) == ["once", "daily"]
+
+    def test_remove(self):
+        self.index.remove("daily")
+        self.index.remove("missing")
+        assert "daily" not in self.index
+        assert self.index.keys_between(dt(1), dt(15)) == ["long", "once"]
+
+    def test_extend(self):
+        assert len(self.index.between(dt(14), dt(20))) == 6
+        assert self.index.before == dt(20)
+        assert len(self.index.between(dt(14), dt(20))) == 6
+
+        index = OccurrenceIndex(dt(10), dt(15))
+        index.add("daily", dt(1, 10), dt(1, 11), rrule=utils.build_rrule(freq="DAILY"))
+        assert [occurrence[0].day for occurrence in index.between(dt(8), dt(12))] == [
+            8,
+            9,
+            10,
+            11,
+        ]
+
+    def test_long_occurrences(self):
+        self.index.add("long", dt(2), dt(9))
+        assert len(self.index._long) == 1
+        assert self.index._short.max_duration == datetime.timedelta(hours=3)
+        self.index.add("year", dt(1), dt(1) + datetime.timedelta(days=365))
+        assert self.index._long.max_duration == datetime.timedelta(days=365)
+        self.index.remove("year")
+        assert self.index._long.max_duration == datetime.timedelta(days=7)
+        assert self.index.keys_between(dt(12), dt(13)) == ["daily"]
+
+    def test_incremental(self):
+        class UnsortableList(list):
+            def sort(self, *args, **kwargs):
+                raise AssertionError("The occurrences were sorted again.")
+
+        for bucket in (self.index._short, self.index._long):
+            bucket.starts = UnsortableList(bucket.starts)
+            bucket.occurrences = UnsortableList(bucket.occurrences)
+
+        self.index.add("once", dt(5, 9), dt(5, 12))
+        self.index.add("other", dt(5, 9), dt(5, 10))
+        assert self.index.keys_between(dt(5, 9), dt(5, 10)) == [
+            "long",
+            "once",
+            "other",
+        ]
+        self.index.remove("other")
+        self.index.remove("long")
+        assert self.index.keys_between(dt(5), dt(6)) == ["once", "daily"]
+        assert self.index._short.starts == sorted(self.index._short.starts)
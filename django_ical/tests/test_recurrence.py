@@ -1,6 +1,7 @@
 """Test calendar rrules."""
 
 import datetime
+import random
 
 from django.test import TestCase
 
@@ -13,12 +14,31 @@ from dateutil.rrule import TU
 from dateutil.rrule import WEEKLY
 from dateutil.rrule import YEARLY
 from dateutil.rrule import rrule
+from dateutil.rrule import weekday
 from icalendar.prop import vRecur
 import recurrence
 
 from django_ical import utils
 
 
+def build_rrule_from_recurrence_text(rule):
+    """Build the vRecur of a django_recurrences rrule via its serialization."""
+    line = recurrence.serialize(rule)
+    if line.startswith("RRULE:"):
+        line = line[6:]
+    return utils.build_rrule_from_text(line)
+
+
+def build_rrule_from_dateutil_text(rule):
+    """Build the vRecur of a dateutil rrule via its string form."""
+    for line in str(rule).splitlines():
+        if line.startswith("DTSTART:"):
+            continue
+        if line.startswith("RRULE:"):
+            line = line[6:]
+        return utils.build_rrule_from_text(line)
+
+
 class BuildRruleTest(TestCase):
     """Test building an Rrule for icalendar."""
 
@@ -630,3 +650,323 @@ class FromDjangoRecurrenceRruleTests(TestCase):
             vRecur(vrecurr).to_ical().decode()
             == "FREQ=WEEKLY;COUNT=7;INTERVAL=17;BYDAY=-1MO,TU;BYMONTH=1,3;WKST=TU"
         )
+
+
+class DirectConversionTests(TestCase):
+    """The direct rule conversions match the string round trip."""
+
+    def random_dateutil_rule(self, rand):
+        kwargs = {"interval": rand.choice([1, 1, 2, 5])}
+        if rand.random() < 0.3:
+            kwargs["wkst"] = rand.randrange(7)
+        if rand.random() < 0.5:
+            kwargs["count"] = rand.randint(1, 20)
+        elif rand.random() < 0.5:
+            kwargs["until"] = datetime.datetime(2030, rand.randint(1, 12), 1, 9)
+        if rand.random() < 0.5:
+            kwargs["byweekday"] = [
+                weekday(rand.randrange(7), rand.choice([None, 1, 2, -1]))
+                for _ in range(rand.randint(1, 3))
+            ]
+        for key, low, high in (
+            ("bymonth", 1, 12),
+            ("bymonthday", -31, 31),
+            ("byyearday", 1, 366),
+            ("byhour", 0, 23),
+            ("byminute", 0, 59),
+            ("bysecond", 0, 59),
+            ("bysetpos", 1, 10),
+        ):
+            if rand.random() < 0.3:
+                kwargs[key] = [
+                    rand.randint(low, high) or 1 for _ in range(rand.randint(1, 3))
+                ]
+        if rand.random() < 0.1:
+            kwargs["byeaster"] = [rand.randint(-10, 10)]
+        return rrule(
+            rand.choice([YEARLY, MONTHLY, WEEKLY, DAILY]),
+            dtstart=datetime.datetime(2024, 1, 1, 9, 0),
+            **kwargs,
+        )
+
+    def random_recurrence_rule(self, rand):
+        kwargs = {"interval": rand.choice([1, 1, 3])}
+        if rand.random() < 0.3:
+            kwargs["wkst"] = rand.randrange(7)
+        if rand.random() < 0.5:
+            kwargs["count"] = rand.randint(1, 20)
+        elif rand.random() < 0.5:
+            kwargs["until"] = datetime.datetime(
+                2030, rand.randint(1, 12), 1, 9, tzinfo=tz.UTC
+            )
+        if rand.random() < 0.5:
+            kwargs["byday"] = [
+                recurrence.to_weekday(
+                    "%s%s" % (rand.choice(["", "1", "-1"]), rand.choice(utils.WEEKDAYS))
+                )
+                for _ in range(rand.randint(1, 3))
+            ]
+        for key, low, high in (
+            ("bymonth", 1, 12),
+            ("bymonthday", 1, 31),
+            ("byhour", 0, 23),
+            ("bysetpos", 1, 10),
+        ):
+            if rand.random() < 0.3:
+                kwargs[key] = [rand.randint(low, high)]
+        return recurrence.Rule(rand.randrange(4), **kwargs)
+
+    def test_dateutil_equivalence(self):
+        rand = random.Random(34)
+        for _ in range(500):
+            rule = self.random_dateutil_rule(rand)
+            self.assertEqual(
+                vRecur(utils.build_rrule_from_dateutil_rrule(rule)).to_ical(),
+                vRecur(build_rrule_from_dateutil_text(rule)).to_ical(),
+                str(rule),
+            )
+
+    def test_recurrence_equivalence(self):
+        rand = random.Random(34)
+        for _ in range(500):
+            rule = self.random_recurrence_rule(rand)
+            self.assertEqual(
+                vRecur(utils.build_rrule_from_recurrences_rrule(rule)).to_ical(),
+                vRecur(build_rrule_from_recurrence_text(rule)).to_ical(),
+                recurrence.serialize(rule),
+            )
+
+    def test_dateutil_aware_until(self):
+        rule = rrule(
+            DAILY,
+            dtstart=datetime.datetime(2024, 1, 1, 9, 0, tzinfo=tz.UTC),
+            until=datetime.datetime(2024, 1, 5, 9, 0, tzinfo=tz.UTC),
+        )
+        vrecurr = utils.build_rrule_from_dateutil_rrule(rule)
+        self.assertEqual(vrecurr.to_ical(), b"FREQ=DAILY;UNTIL=20240105T090000Z")
+
+    def test_recurrence_invalid(self):
+        rule = recurrence.Rule(recurrence.WEEKLY, byday=["XX"])
+        with self.assertRaises(recurrence.exceptions.SerializationError):
+            utils.build_rrule_from_recurrences_rrule(rule)
+
+
+class FromDjangoRecurrenceTests(TestCase):
+    """Build item properties from a django-recurrence Recurrence."""
+
+    def test_empty(self):
+        self.assertEqual(
+            utils.build_properties_from_recurrence(recurrence.Recurrence()), {}
+        )
+
+    def test_recurrence(self):
+        properties = utils.build_properties_from_recurrence(
+            recurrence.Recurrence(
+                dtstart=datetime.datetime(2024, 1, 1, 9, 0, tzinfo=tz.UTC),
+                rrules=[
+                    recurrence.Rule(recurrence.WEEKLY),
+                    recurrence.Rule(recurrence.MONTHLY, bymonthday=[1, 15]),
+                ],
+                exrules=[recurrence.Rule(recurrence.DAILY, count=3)],
+                rdates=[
+                    datetime.datetime(2024, 2, 1, 9, 0, tzinfo=tz.UTC),
+                    datetime.datetime(2024, 3, 1, 9, 0, tzinfo=tz.UTC),
+                ],
+                exdates=[
+                    datetime.date(2024, 1, 8),
+                    datetime.datetime(
+                        2024, 1, 15, 10, 0, tzinfo=tz.tzoffset(None, 3600)
+                    ),
+                ],
+            )
+        )
+        self.assertEqual(sorted(properties), ["exdate", "exrule", "rdate", "rrule"])
+        self.assertEqual(
+            [rule.to_ical() for rule in properties["rrule"]],
+            [b"FREQ=WEEKLY", b"FREQ=MONTHLY;BYMONTHDAY=1,15"],
+        )
+        self.assertEqual(
+            [rule.to_ical() for rule in properties["exrule"]],
+            [b"FREQ=DAILY;COUNT=3"],
+        )
+        self.assertEqual(
+            [dates.to_ical() for dates in properties["rdate"]],
+            [b"20240201T090000Z,20240301T090000Z"],
+        )
+        self.assertEqual(
+            [dates.to_ical() for dates in properties["exdate"]],
+            [b"20240115T090000Z", b"20240108"],
+        )
+        self.assertEqual(properties["exdate"][1].params["VALUE"], "DATE")
+
+    def test_occurrences(self):
+        properties = utils.build_properties_from_recurrence(
+            recurrence.Recurrence(
+                rdates=[datetime.datetime(2024, 1, 3, 9, 0, tzinfo=tz.UTC)],
+                exdates=[datetime.datetime(2024, 1, 2, 9, 0, tzinfo=tz.UTC)],
+                rrules=[recurrence.Rule(recurrence.DAILY, count=2)],
+            )
+        )
+        start = datetime.datetime(2024, 1, 1, 9, 0, tzinfo=tz.UTC)
+        occurrences = utils.iter_occurrences(
+            start,
+            start + datetime.timedelta(hours=1),
+            after=start,
+            before=start + datetime.timedelta(days=7),
+            **properties,
+        )
+        self.assertEqual(
+            [occurrence_start.day for occurrence_start, end in occurrences], [1, 3]
+        )
+
+
+class OccurrencesTests(TestCase):
+    """Test expanding items into occurrences."""
+
+    def test_single(self):
+        start = datetime.datetime(2024, 1, 1, 10, 0)
+        end = datetime.datetime(2024, 1, 1, 11, 0)
+        assert list(utils.iter_occurrences(start, end)) == [(start, end)]
+
+    def test_all_day(self):
+        assert list(utils.iter_occurrences(datetime.date(2024, 1, 1), None)) == [
+            (datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 2))
+        ]
+
+    def test_window(self):
+        start = datetime.datetime(2024, 1, 1, 10, 0)
+        end = datetime.datetime(2024, 1, 1, 11, 0)
+        occurrences = utils.iter_occurrences(
+            start,
+            end,
+            rrule=utils.build_rrule(freq="DAILY"),
+            exdate=[datetime.date(2024, 1, 3)],
+            after=datetime.datetime(2024, 1, 2, 10, 30),
+            before=datetime.datetime(2024, 1, 5),
+        )
+        assert [occurrence[0].day for occurrence in occurrences] == [2, 4]
+
+    def test_rdate(self):
+        start = datetime.datetime(2024, 1, 1, 10, 0)
+        occurrences = utils.iter_occurrences(
+            start, start, rdate=[datetime.date(2024, 2, 1)]
+        )
+        assert [occurrence[0] for occurrence in occurrences] == [
+            start,
+            datetime.datetime(2024, 2, 1, 10, 0),
+        ]
+
+    def test_unbounded(self):
+        start = datetime.datetime(2024, 1, 1, 10, 0)
+        with self.assertRaises(ValueError):
+            list(utils.iter_occurrences(start, start, rrule={"FREQ": "DAILY"}))
+
+
+class MergeIntervalsTests(TestCase):
+    """Test merging busy time."""
+
+    def test_merge(self):
+        assert utils.merge_intervals([(3, 5), (1, 2), (2, 3), (7, 9), (8, 8)]) == [
+            (1, 5),
+            (7, 9),
+        ]
+
+    def test_empty(self):
+        assert utils.merge_intervals([]) == []
+
+
+class RecurrenceRuleTests(TestCase):
+    """Test the immutable recurrence rule."""
+
+    def test_render(self):
+        rule = utils.RecurrenceRule(
+            "WEEKLY", interval=17, count=7, byday=["-1MO", "+2TU"], bymonth=[1, 3]
+        )
+        assert (
+            rule.to_ical()
+            == b"FREQ=WEEKLY;COUNT=7;INTERVAL=17;BYDAY=-1MO,2TU;BYMONTH=1,3"
+        )
+        assert rule.to_vrecur().to_ical() == rule.to_ical()
+        assert rule.byday == ("-1MO", "2TU")
+        assert rule.bymonth == (1, 3)
+
+    def test_immutable(self):
+        rule = utils.RecurrenceRule("DAILY")
+        with self.assertRaises(AttributeError):
+            rule.freq = "WEEKLY"
+
+    def test_hashable(self):
+        rules = {
+            utils.RecurrenceRule("MONTHLY", bymonthday=4),
+            utils.RecurrenceRule("MONTHLY", bymonthday=[4]),
+            utils.RecurrenceRule.from_text("FREQ=MONTHLY;BYMONTHDAY=4"),
+        }
+        assert len(rules) == 1
+
+    def test_validation(self):
+        for kwargs in (
+            {"freq": "FORTNIGHTLY"},
+            {"freq": "DAILY", "interval": 0},
+            {"freq": "DAILY", "byhour": 24},
+            {"freq": "MONTHLY", "bymonthday": 0},
+            {"freq": "MONTHLY", "bymonthday": -32},
+            {"freq": "YEARLY", "bymonth": 13},
+            {"freq": "MONTHLY", "byday": "XX"},
+            {"freq": "MONTHLY", "byday": "54MO"},
+            {"freq": "WEEKLY", "wkst": "XX"},
+            {"freq": "DAILY", "count": 2, "until": datetime.date(2024, 1, 1)},
+        ):
+            with self.assertRaises(ValueError):
+                utils.RecurrenceRule(**kwargs)
+
+    def test_validation_types(self):
+        with self.assertRaisesRegex(ValueError, "BYHOUR should be an integer"):
+            utils.RecurrenceRule("DAILY", byhour="5")
+        with self.assertRaisesRegex(ValueError, "BYMONTHDAY should be an integer"):
+            utils.RecurrenceRule("MONTHLY", bymonthday=[1, None])
+        with self.assertRaisesRegex(ValueError, "INTERVAL should be a positive"):
+            utils.RecurrenceRule("DAILY", interval="2")
+        with self.assertRaisesRegex(ValueError, "COUNT should be a positive"):
+            utils.RecurrenceRule("DAILY", count=1.5)
+
+    def test_vrecur(self):
+        vrecurr = utils.build_rrule(freq="MONTHLY", byday="+3TU", count=3)
+        rule = utils.RecurrenceRule.from_vrecur(vrecurr)
+        assert rule.to_ical() == b"FREQ=MONTHLY;COUNT=3;BYDAY=3TU"
+
+    def test_unsupported_parts(self):
+        with self.assertRaisesRegex(ValueError, "Unsupported rule part X-NAME"):
+            utils.RecurrenceRule.from_text("FREQ=DAILY;X-NAME=value")
+        with self.assertRaisesRegex(ValueError, "Unsupported rule part BYEASTER"):
+            utils.RecurrenceRule.from_dateutil(rrule(YEARLY, byeaster=0))
+
+    def test_dateutil(self):
+        rule = utils.RecurrenceRule("MONTHLY", byday="-1FR", count=3)
+        start = datetime.datetime(2024, 1, 1, 10, 0)
+        assert list(rule.to_dateutil(start)) == [
+            datetime.datetime(2024, 1, 26, 10, 0),
+            datetime.datetime(2024, 2, 23, 10, 0),
+            datetime.datetime(2024, 3, 29, 10, 0),
+        ]
+        assert utils.RecurrenceRule.from_dateutil(rule.to_dateutil(start)) == rule
+
+    def test_recurrence(self):
+        rule = utils.RecurrenceRule("WEEKLY", byday=["MO", "TU"], wkst="TU")
+        converted = rule.to_recurrence()
+        assert converted.freq == recurrence.WEEKLY
+        assert converted.byday == [
+            recurrence.to_weekday("MO"),
+            recurrence.to_weekday("TU"),
+        ]
+        assert utils.RecurrenceRule.from_recurrence(converted) == rule
+
+    def test_feed_item(self):
+        rule = utils.RecurrenceRule("DAILY", byhour=10)
+        occurrences = utils.iter_occurrences(
+            datetime.datetime(2024, 1, 1, 10, 0),
+            None,
+            rrule=rule,
+            after=datetime.datetime(2024, 1, 1),
+            before=datetime.datetime(2024, 1, 3),
+        )
+        assert len(list(occurrences)) == 2
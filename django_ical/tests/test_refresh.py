@@ -0,0 +1,82 @@
+import json
+import threading
+
+from django.test import SimpleTestCase
+
+from django_ical.refresh import RefreshTask
+from django_ical.refresh import ThreadPoolRefreshBackend
+from django_ical.refresh import get_default_backend
+
+
+class FakeTask:
+    def __init__(self, key, run):
+        self.key = key
+        self.run = run
+
+
+class ThreadPoolRefreshBackendTest(SimpleTestCase):
+    def test_deduplicates_pending_refreshes(self):
+        backend = ThreadPoolRefreshBackend()
+        release = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            release.wait(5)
+
+        first = backend.enqueue(FakeTask("feed", refresh))
+        self.assertIsNone(backend.enqueue(FakeTask("feed", refresh)))
+        other = backend.enqueue(FakeTask("other", lambda: calls.append(2)))
+        other.result(5)
+        release.set()
+        first.result(5)
+
+        again = backend.enqueue(FakeTask("feed", lambda: calls.append(3)))
+        again.result(5)
+        self.assertEqual(sorted(calls), [1, 2, 3])
+
+    def test_logs_errors(self):
+        backend = ThreadPoolRefreshBackend()
+
+        def refresh():
+            raise ValueError("broken feed")
+
+        with self.assertLogs("django_ical.refresh", "ERROR") as logs:
+            backend.enqueue(FakeTask("feed", refresh)).result(5)
+        self.assertIn("Refreshing the cached feed feed failed", logs.output[0])
+        # A failed refresh doesn't block the next one.
+        self.assertIsNotNone(backend.enqueue(FakeTask("feed", lambda: None)))
+
+    def test_default_backend(self):
+        self.assertIs(get_default_backend(), get_default_backend())
+
+
+class RefreshTaskTest(SimpleTestCase):
+    def test_serializable(self):
+        task = RefreshTask(
+            key="django_ical.feed.abc",
+            feed="django_ical.tests.test_feed.TestStaleFeed",
+            url="https://testserver:8443/events/%C3%A9t%C3%A9?page=2",
+            language="fr",
+            args=["summer"],
+            kwargs={"year": "2024"},
+            etag='"123"',
+        )
+        self.assertEqual(RefreshTask(*json.loads(json.dumps(task))), task)
+
+    def test_build_request(self):
+        task = RefreshTask(
+            key="django_ical.feed.abc",
+            feed="django_ical.tests.test_feed.TestStaleFeed",
+            url="https://testserver:8443/events/%C3%A9t%C3%A9?page=2",
+            language="fr",
+            args=[],
+            kwargs={},
+            etag=None,
+        )
+        request = task.build_request()
+        self.assertEqual(request.method, "GET")
+        self.assertEqual(request.path, "/events/été")
+        self.assertEqual(request.GET["page"], "2")
+        self.assertTrue(request.is_secure())
+        self.assertEqual(request.build_absolute_uri(), task.url)
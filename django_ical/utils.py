@@ -1,7 +1,47 @@
 """Utility functions to build calendar rules."""
 
+import re
+from datetime import datetime, time, timedelta
+
+from dateutil import rrule as dateutil_rrule
+from dateutil import tz as dateutil_tz
+from dateutil.rrule import rruleset, rrulestr
+from icalendar.prop import vDDDLists
 from icalendar.prop import vRecur
-from recurrence import serialize
+import recurrence
+from recurrence import base as recurrence_base
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+BYDAY_RE = re.compile(r"^([+-]?[0-9]{1,2})?(MO|TU|WE|TH|FR|SA|SU)$")
+
+# Rule parts of a dateutil rrule, in the order ``rrule.__str__`` writes them
+DATEUTIL_RULE_PARTS = (
+    ("BYSETPOS", "bysetpos"),
+    ("BYMONTH", "bymonth"),
+    ("BYMONTHDAY", "bymonthday"),
+    ("BYYEARDAY", "byyearday"),
+    ("BYWEEKNO", "byweekno"),
+    ("BYDAY", "byweekday"),
+    ("BYHOUR", "byhour"),
+    ("BYMINUTE", "byminute"),
+    ("BYSECOND", "bysecond"),
+    ("BYEASTER", "byeaster"),
+)
+
+# Valid values of the integer rule parts, see
+# http://www.rfc-editor.org/rfc/rfc5545.txt (sec 3.3.10)
+RULE_PART_RANGES = (
+    # (name, minimum, maximum, may be negative)
+    ("bysecond", 0, 60, False),
+    ("byminute", 0, 59, False),
+    ("byhour", 0, 23, False),
+    ("bymonthday", 1, 31, True),
+    ("byyearday", 1, 366, True),
+    ("byweekno", 1, 53, True),
+    ("bymonth", 1, 12, False),
+    ("bysetpos", 1, 366, True),
+)
 
 
 def build_rrule(  # noqa
@@ -101,11 +141,38 @@ def build_rrule_from_recurrences_rrule(rule):
     django_recurrences is a popular implementation for recurrences in django.
     https://pypi.org/project/django-recurrence/
     this is a shortcut to interface between recurrences and icalendar.
+
+    The rule parts are read straight off the rule, in the order
+    ``recurrence.serialize`` would write them, instead of being serialized
+    and parsed back.
     """
-    line = serialize(rule)
-    if line.startswith("RRULE:"):
-        line = line[6:]
-    return build_rrule_from_text(line)
+    try:
+        recurrence.validate(rule)
+    except recurrence.exceptions.ValidationError as error:
+        raise recurrence.exceptions.SerializationError(error.args[0])
+    parts = {"FREQ": [recurrence.Rule.frequencies[rule.freq]]}
+    if rule.interval != 1:
+        parts["INTERVAL"] = [int(rule.interval)]
+    if rule.wkst:
+        parts["WKST"] = [WEEKDAYS[getattr(rule.wkst, "number", rule.wkst)]]
+    if rule.count is not None:
+        parts["COUNT"] = [int(rule.count)]
+    elif rule.until is not None:
+        parts["UNTIL"] = [recurrence_base.to_utc(rule.until)]
+    if rule.byday:
+        days = []
+        for day in rule.byday:
+            day = recurrence_base.to_weekday(day)
+            if day.index:
+                days.append("%s%s" % (day.index, WEEKDAYS[day.number]))
+            else:
+                days.append(WEEKDAYS[day.number])
+        parts["BYDAY"] = days
+    for param in recurrence.Rule.byparams:
+        value = getattr(rule, param, None)
+        if param != "byday" and value:
+            parts[param.upper()] = [int(v) for v in value]
+    return vRecur(parts)
 
 
 def build_rrule_from_dateutil_rrule(rule):
@@ -115,11 +182,469 @@ def build_rrule_from_dateutil_rrule(rule):
     Dateutils rrule is a popular implementation of rrule in python.
     https://pypi.org/project/python-dateutil/
     this is a shortcut to interface between dateutil and icalendar.
+
+    The rule parts are read straight off the rule, following
+    ``rrule.__str__``, instead of being formatted and parsed back. An aware
+    UNTIL is converted to UTC rather than losing its timezone.
     """
-    lines = str(rule).splitlines()
-    for line in lines:
-        if line.startswith("DTSTART:"):
+    parts = {"FREQ": [dateutil_rrule.FREQNAMES[rule._freq]]}
+    if rule._interval != 1:
+        parts["INTERVAL"] = [rule._interval]
+    if rule._wkst:
+        parts["WKST"] = [WEEKDAYS[rule._wkst]]
+    if rule._count is not None:
+        parts["COUNT"] = [rule._count]
+    if rule._until:
+        until = rule._until
+        if until.tzinfo is not None:
+            until = until.astimezone(dateutil_tz.UTC)
+        parts["UNTIL"] = [until]
+    original = rule._original_rule
+    for name, key in DATEUTIL_RULE_PARTS:
+        value = original.get(key)
+        if not value:
             continue
-        if line.startswith("RRULE:"):
-            line = line[6:]
-        return build_rrule_from_text(line)
+        if key == "byweekday":
+            value = [
+                "%+d%s" % (day.n, WEEKDAYS[day.weekday])
+                if day.n
+                else WEEKDAYS[day.weekday]
+                for day in value
+            ]
+        elif key == "byeaster":
+            value = [str(v) for v in value]
+        parts[name] = list(value)
+    return vRecur(parts)
+
+
+def build_properties_from_recurrence(recurrence):
+    """
+    Build the rrule, exrule, rdate and exdate values of an item from a
+    django_recurrences Recurrence.
+
+    Every rule is converted to a vRecur. The dates are batched into one
+    multi-valued property per value type, with datetimes converted to UTC
+    as django_recurrences serializes them. The dtstart and dtend of the
+    recurrence are not included, they are the item's start and end.
+
+    :param recurrence: recurrence.Recurrence
+    :return: dict of the item fields that have values
+    """
+    properties = {}
+    for field, rules in (
+        ("rrule", recurrence.rrules),
+        ("exrule", recurrence.exrules),
+    ):
+        if rules:
+            properties[field] = [build_rrule_from_recurrences_rrule(r) for r in rules]
+    for field, dates in (
+        ("rdate", recurrence.rdates),
+        ("exdate", recurrence.exdates),
+    ):
+        if dates:
+            properties[field] = build_date_lists(dates)
+    return properties
+
+
+def build_date_lists(dates):
+    """
+    Batch dates into multi-valued RDATE or EXDATE values.
+
+    A property can only hold values of one type, so dates and datetimes
+    end up in separate values. Datetimes are converted to UTC.
+
+    :param dates: list of dates or datetimes
+    :return: list of vDDDLists
+    """
+    datetimes = []
+    days = []
+    for value in dates:
+        if isinstance(value, datetime):
+            datetimes.append(recurrence_base.to_utc(value))
+        else:
+            days.append(value)
+    lists = []
+    if datetimes:
+        lists.append(vDDDLists(datetimes))
+    if days:
+        day_list = vDDDLists(days)
+        day_list.params["VALUE"] = "DATE"
+        lists.append(day_list)
+    return lists
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return value
+    return [value]
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _as_dates(value):
+    """Flatten vDDDLists into the dates they hold."""
+    dates = []
+    for item in _as_list(value):
+        if isinstance(item, vDDDLists):
+            dates.extend(dt.dt for dt in item.dts)
+        else:
+            dates.append(item)
+    return dates
+
+
+def _as_datetime(value, start):
+    """Turn dates into datetimes at the time of day of ``start``."""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, start.timetz())
+    return value
+
+
+def _as_dateutil_rrule(rule, start):
+    if isinstance(rule, RecurrenceRule):
+        return rule.to_dateutil(start)
+    if not isinstance(rule, vRecur):
+        rule = vRecur(rule)
+    return rrulestr(rule.to_ical().decode(), dtstart=start)
+
+
+def iter_occurrences(  # noqa
+    start,
+    end,
+    rrule=None,
+    exrule=None,
+    rdate=None,
+    exdate=None,
+    after=None,
+    before=None,
+):
+    """
+    Yield the ``(start, end)`` datetimes of all occurrences of an item.
+
+    Recurring items are expanded with dateutil. Only occurrences overlapping
+    the window between ``after`` and ``before`` are yielded, which is
+    required for rules without an end.
+
+    :param start: date or datetime, dtstart of the item
+    :param end: date or datetime, dtend of the item
+    :param rrule: rrule or list of rrules, as built by build_rrule
+    :param exrule: exrule or list of exrules, as built by build_rrule
+    :param rdate: date, list of dates or of vDDDLists
+    :param exdate: date, list of dates or of vDDDLists
+    :param after: datetime, start of the window
+    :param before: datetime, end of the window
+    :return: iterator of (datetime, datetime) tuples
+    """
+    all_day = not isinstance(start, datetime)
+    if all_day:
+        start = datetime.combine(start, time(), getattr(after, "tzinfo", None))
+    if end is None:
+        end = start + timedelta(days=1) if all_day else start
+    end = _as_datetime(end, start)
+    duration = end - start
+
+    rrules = _as_list(rrule)
+    rdates = _as_dates(rdate)
+    if not rrules and not rdates:
+        occurrences = [start]
+    else:
+        if rrules and (after is None or before is None):
+            raise ValueError("Recurring items need a window to be expanded.")
+        rules = rruleset()
+        rules.rdate(start)
+        for rule in rrules:
+            rules.rrule(_as_dateutil_rrule(rule, start))
+        for rule in _as_list(exrule):
+            rules.exrule(_as_dateutil_rrule(rule, start))
+        for value in rdates:
+            rules.rdate(_as_datetime(value, start))
+        for value in _as_dates(exdate):
+            rules.exdate(_as_datetime(value, start))
+        if after is None or before is None:
+            occurrences = rules
+        else:
+            occurrences = rules.between(after - duration, before, inc=True)
+
+    for occurrence in occurrences:
+        if after is not None and occurrence + duration <= after:
+            continue
+        if before is not None and occurrence >= before:
+            continue
+        yield occurrence, occurrence + duration
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping and adjacent ``(start, end)`` intervals.
+
+    The intervals are sorted by their start and merged in a single sweep.
+
+    :param intervals: iterable of (start, end) tuples
+    :return: list of (start, end) tuples, sorted by start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class _RenderedRecur(vRecur):
+    """vRecur rendering its value once."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ical = super().to_ical()
+
+    def to_ical(self):
+        return self._ical
+
+
+class RecurrenceRule:
+    """
+    Immutable, validated recurrence rule.
+
+    The rule parts are validated once when the rule is created, the rule
+    is hashable so equal rules can be shared between items, and its RRULE
+    value is rendered once. Pass it as ``item_rrule`` or ``item_exrule``.
+
+    :param freq: str, frequency name ('WEEKLY', 'MONTHLY', etc)
+    :param interval: int
+    :param count: int
+    :param until: date or datetime
+    :param bysecond: int or list of ints
+    :param byminute: int or list of ints
+    :param byhour: int or list of ints
+    :param byday: str or list of strs, weekdays with an optional ordinal ('+3TU')
+    :param bymonthday: int or list of ints
+    :param byyearday: int or list of ints
+    :param byweekno: int or list of ints
+    :param bymonth: int or list of ints
+    :param bysetpos: int or list of ints
+    :param wkst: str, two-letter weekday
+    """
+
+    __slots__ = (
+        "freq",
+        "interval",
+        "count",
+        "until",
+        "bysecond",
+        "byminute",
+        "byhour",
+        "byday",
+        "bymonthday",
+        "byyearday",
+        "byweekno",
+        "bymonth",
+        "bysetpos",
+        "wkst",
+        "_vrecur",
+    )
+
+    def __init__(  # noqa
+        self,
+        freq,
+        interval=None,
+        count=None,
+        until=None,
+        bysecond=None,
+        byminute=None,
+        byhour=None,
+        byday=None,
+        bymonthday=None,
+        byyearday=None,
+        byweekno=None,
+        bymonth=None,
+        bysetpos=None,
+        wkst=None,
+    ):
+        if freq not in vRecur.frequencies:
+            raise ValueError(f"Frequency value should be one of: {vRecur.frequencies}")
+        if interval is not None and not (_is_int(interval) and interval >= 1):
+            raise ValueError("INTERVAL should be a positive integer")
+        if count is not None and not (_is_int(count) and count >= 1):
+            raise ValueError("COUNT should be a positive integer")
+        if count is not None and until is not None:
+            raise ValueError("COUNT and UNTIL can't be used together")
+        if wkst is not None and wkst not in WEEKDAYS:
+            raise ValueError(f"WKST value should be one of: {WEEKDAYS}")
+
+        parts = {
+            "bysecond": bysecond,
+            "byminute": byminute,
+            "byhour": byhour,
+            "bymonthday": bymonthday,
+            "byyearday": byyearday,
+            "byweekno": byweekno,
+            "bymonth": bymonth,
+            "bysetpos": bysetpos,
+        }
+        for name, minimum, maximum, signed in RULE_PART_RANGES:
+            values = tuple(_as_list(parts[name]))
+            for value in values:
+                if not _is_int(value):
+                    raise ValueError(
+                        f"{name.upper()} should be an integer or a list of "
+                        f"integers, got {value!r}"
+                    )
+                if not minimum <= (abs(value) if signed else value) <= maximum:
+                    raise ValueError(f"Invalid {name.upper()} value {value}")
+            parts[name] = values
+
+        days = []
+        for day in _as_list(byday):
+            match = BYDAY_RE.match(str(day).upper())
+            if match is None:
+                raise ValueError(f"Invalid BYDAY value {day}")
+            if match.group(1):
+                ordinal = int(match.group(1))
+                if not 1 <= abs(ordinal) <= 53:
+                    raise ValueError(f"Invalid BYDAY value {day}")
+                days.append(f"{ordinal}{match.group(2)}")
+            else:
+                days.append(match.group(2))
+        byday = tuple(days)
+
+        set_attr = object.__setattr__
+        set_attr(self, "freq", freq)
+        set_attr(self, "interval", interval)
+        set_attr(self, "count", count)
+        set_attr(self, "until", until)
+        set_attr(self, "byday", byday)
+        set_attr(self, "wkst", wkst)
+        for name, values in parts.items():
+            set_attr(self, name, values)
+        set_attr(self, "_vrecur", _RenderedRecur(build_rrule(**self._as_kwargs())))
+
+    def _as_kwargs(self):
+        kwargs = {}
+        for name in self.__slots__:
+            if name.startswith("_"):
+                continue
+            value = getattr(self, name)
+            if value is not None and value != ():
+                kwargs[name] = value
+        return kwargs
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, RecurrenceRule):
+            return NotImplemented
+        return self.to_ical() == other.to_ical()
+
+    def __hash__(self):
+        return hash(self.to_ical())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_ical().decode()!r})"
+
+    def __reduce__(self):
+        return (_rule_from_kwargs, (self._as_kwargs(),))
+
+    def to_ical(self):
+        """Returns the rendered RRULE value."""
+        return self._vrecur.to_ical()
+
+    def to_vrecur(self):
+        """
+        Returns the rule as a vRecur, which renders to the cached value.
+
+        The vRecur is shared by all users of the rule and must not be
+        modified.
+        """
+        return self._vrecur
+
+    @classmethod
+    def from_vrecur(cls, rule):
+        """
+        Builds a rule from a vRecur or a dictionary as built by build_rrule.
+
+        Raises ValueError for rule parts RecurrenceRule doesn't support, such
+        as dateutil's BYEASTER or X- parts.
+        """
+        kwargs = {}
+        for key, value in rule.items():
+            key = key.lower()
+            if key.startswith("_") or key not in cls.__slots__:
+                raise ValueError(f"Unsupported rule part {key.upper()}")
+            if key in ("freq", "interval", "count", "until", "wkst"):
+                value = _as_list(value)[0]
+            kwargs[key] = value
+        return cls(**kwargs)
+
+    @classmethod
+    def from_text(cls, rrule_str):
+        """Builds a rule from a serialzed RRULE string."""
+        return cls.from_vrecur(build_rrule_from_text(rrule_str))
+
+    @classmethod
+    def from_dateutil(cls, rule):
+        """Builds a rule from a dateutil rrule."""
+        return cls.from_vrecur(build_rrule_from_dateutil_rrule(rule))
+
+    @classmethod
+    def from_recurrence(cls, rule):
+        """Builds a rule from a django-recurrence Rule."""
+        return cls.from_vrecur(build_rrule_from_recurrences_rrule(rule))
+
+    def to_dateutil(self, dtstart=None):
+        """Returns the rule as a dateutil rrule starting at ``dtstart``."""
+        byweekday = []
+        for day in self.byday:
+            match = BYDAY_RE.match(day)
+            weekday = getattr(dateutil_rrule, match.group(2))
+            if match.group(1):
+                weekday = weekday(int(match.group(1)))
+            byweekday.append(weekday)
+
+        return dateutil_rrule.rrule(
+            getattr(dateutil_rrule, self.freq),
+            dtstart=dtstart,
+            interval=self.interval or 1,
+            wkst=WEEKDAYS.index(self.wkst) if self.wkst else None,
+            count=self.count,
+            until=self.until,
+            bysetpos=self.bysetpos or None,
+            bymonth=self.bymonth or None,
+            bymonthday=self.bymonthday or None,
+            byyearday=self.byyearday or None,
+            byweekno=self.byweekno or None,
+            byweekday=byweekday or None,
+            byhour=self.byhour or None,
+            byminute=self.byminute or None,
+            bysecond=self.bysecond or None,
+        )
+
+    def to_recurrence(self):
+        """Returns the rule as a django-recurrence Rule."""
+        kwargs = {
+            name: list(getattr(self, name))
+            for name in recurrence.Rule.byparams
+            if name != "byday" and getattr(self, name)
+        }
+        if self.byday:
+            kwargs["byday"] = [recurrence.to_weekday(day) for day in self.byday]
+        return recurrence.Rule(
+            getattr(recurrence, self.freq),
+            interval=self.interval or 1,
+            wkst=WEEKDAYS.index(self.wkst) if self.wkst else None,
+            count=self.count,
+            until=self.until,
+            **kwargs,
+        )
+
+
+def _rule_from_kwargs(kwargs):
+    return RecurrenceRule(**kwargs)
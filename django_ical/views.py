@@ -2,27 +2,58 @@
 Views for generating ical feeds.
 """
 
-from datetime import datetime
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from calendar import timegm
-from inspect import signature
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from itertools import chain, islice
+from queue import Full, Queue
+from threading import Event, local
+from hashlib import sha256
+from inspect import getattr_static, signature
+from time import monotonic, sleep, time
+from uuid import uuid4
 
-from django.http import HttpResponse, Http404
-from django.core.exceptions import ObjectDoesNotExist
-from django.contrib.syndication.views import Feed
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    ObjectDoesNotExist,
+    ValidationError,
+)
+from django.contrib.sites.shortcuts import get_current_site
+from django.contrib.syndication.views import Feed, add_domain
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import connections
+from django.db.models import QuerySet
+from django.template import TemplateDoesNotExist, loader
+from django.utils.cache import quote_etag
 from django.utils.http import http_date
+from django.utils.timezone import get_default_timezone, is_naive, make_aware, now
+from django.utils.translation import get_language, override
 
 from django_ical import feedgenerator
+from django_ical.debug import QueryRecorder
+from django_ical.refresh import RefreshTask, get_default_backend
+from django_ical.utils import build_properties_from_recurrence
 
-__all__ = ("ICalFeed",)
+__all__ = ("ICalFeed", "ICalFreeBusyFeed", "ICalMergedFeed")
 
 # Extra fields added to the Feed object
 # to support ical
-FEED_EXTRA_FIELDS = ("method", "product_id", "timezone")
+FEED_EXTRA_FIELDS = ("method", "product_id", "timezone", "timestamp", "deterministic")
 
 # Extra fields added to items (events) to
 # support ical
 ICAL_EXTRA_FIELDS = [
-    "component_type", # type of calendar component (event, todo)
+    "component_type", # type of calendar component (event, todo, journal, freebusy)
     "timestamp",  # dtstamp
     "created",  # created
     "start_datetime",  # dtstart
@@ -43,8 +74,162 @@ ICAL_EXTRA_FIELDS = [
     "percent_complete", # percent-complete
     "priority", # priority
     "due", # due
+    "duration",  # duration of events and tasks
+    "freebusy",  # list of busy (start, end) periods of freebusy items
 ]
 
+# Item accessors, without their item_ prefix, and the keyword arguments
+# of feed.add_item they fill
+ITEM_KWARGS = (
+    ("title", "title"),
+    ("description", "description"),
+    ("link", "link"),
+    ("guid", "unique_id"),
+    ("guid_is_permalink", "unique_id_is_permalink"),
+    ("enclosures", "enclosures"),
+    ("pubdate", "pubdate"),
+    ("updateddate", "updateddate"),
+    ("author_name", "author_name"),
+    ("author_email", "author_email"),
+    ("author_link", "author_link"),
+    ("comments", "comments"),
+    ("categories", "categories"),
+    ("copyright", "item_copyright"),
+    ("recurrence", "recurrence"),
+) + tuple((field, field) for field in ICAL_EXTRA_FIELDS)
+
+# A single range of a Range header, see RFC 9110 (sec 14.1.2)
+BYTE_RANGE_RE = re.compile(r"^bytes=\s*(\d*)-(\d*)\s*$")
+
+# Item fields used to compute free/busy time
+FREEBUSY_FIELDS = (
+    "start_datetime",
+    "end_datetime",
+    "rrule",
+    "exrule",
+    "rdate",
+    "exdate",
+    "transparency",
+    "status",
+)
+
+
+class _Prefetched(local):
+    # Values of the item accessors evaluated ahead in a thread pool, by
+    # (accessor, id(item)), for the current thread
+    values = None
+
+
+_prefetched = _Prefetched()
+
+
+class _FeedEnd:
+    # Marks the end of the items of a feed read in a thread, with the
+    # exception that ended it, if any
+    def __init__(self, error=None):
+        self.error = error
+
+
+def _put(queue, value, stop):
+    """
+    Puts value in queue unless stop is set first, returns whether it was.
+    """
+    while not stop.is_set():
+        try:
+            queue.put(value, timeout=0.1)
+        except Full:
+            continue
+        return True
+    return False
+
+
+def _close_connections(opened):
+    """
+    Closes the database connections opened by the threads of a pool that
+    has shut down.
+    """
+    for connection in opened:
+        connection.inc_thread_sharing()
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+
+
+@lru_cache(maxsize=1024)
+def _count_cached_args(func):
+    return len(signature(func).parameters)
+
+
+def _count_args(func):
+    # Bound methods are new objects on every feed instance, the counts are
+    # cached for their function instead.
+    target = getattr(func, "__func__", func)
+    bound = 1 if target is not func else 0
+    try:
+        return _count_cached_args(target) - bound
+    except TypeError:
+        # Unhashable callables can't be cached.
+        return len(signature(func).parameters)
+
+
+def parse_byte_range(header, length):
+    """
+    Returns the (start, stop) offsets of a single byte range Range header.
+
+    Returns None when there is no header or it isn't a single byte range,
+    the whole content is sent then. Raises ValueError when the range is
+    not satisfiable.
+    """
+    match = BYTE_RANGE_RE.match(header or "")
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range, the last bytes of the content.
+        start, stop = max(length - int(last), 0), length
+    else:
+        start = int(first)
+        stop = length if not last else min(int(last) + 1, length)
+        if last and int(last) < start:
+            return None
+    if start >= stop:
+        raise ValueError("Unsatisfiable range %r" % header)
+    return start, stop
+
+
+def _etag_matches(request, etag):
+    """
+    Whether the If-None-Match header of request matches etag.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # If-None-Match uses the weak comparison.
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _if_range_matches(request, headers):
+    """
+    Whether the If-Range header of request matches the cached response.
+    """
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == headers.get("ETag")
+    return if_range == headers.get("Last-Modified")
+
 
 class ICalFeed(Feed):
     """
@@ -64,6 +249,10 @@ class ICalFeed(Feed):
 
     :method: METHOD
     :timezone: X-WR-TIMEZONE
+    :timestamp: DTSTAMP of items without item_timestamp or item_updateddate
+    :deterministic: Render identical data as identical bytes, see
+        ICal20Feed.iter_components
+    :versions: Versions of the items the ETag is computed from, see get_etag
     :item_class: CLASS
     :item_timestamp: DTSTAMP
     :item_created: CREATED
@@ -72,10 +261,102 @@ class ICalFeed(Feed):
     :item_transparency: TRANSP
     :item_attendee: ATTENDEE
     :item_valarm: VALARM
+
+    Instrumentation
+
+    :debug_queries: Count the queries run by each accessor and log the
+        item accessors running a query per item.
+    :query_budget: Maximum number of queries a render may run, raises
+        QueryBudgetExceeded otherwise. Implies debug_queries.
+
+    Paging
+
+    :paginate_by: Split the feed into pages of this many items.
+    :page_key: Unique field the pages are ordered and split by.
+    :page_kwarg: Query parameter holding the key a page starts after.
+    :index_kwarg: Query parameter requesting the list of pages.
+
+    Items
+
+    :item_fields: Dict of item accessor names, without the item_ prefix,
+        to the model lookups they are read from. items() has to return a
+        QuerySet, which is read with values_list() instead of instantiating
+        models. Title and description templates aren't rendered.
+    :threaded_accessors: Names of I/O-bound item accessors, like
+        "item_geolocation", evaluated ahead in a thread pool for
+        accessor_chunk_size items at a time, in the language of the
+        request. Items keep their order. With debug_queries or
+        query_budget, they are evaluated in the request thread.
+    :accessor_workers: Maximum number of threads evaluating accessors.
+    :accessor_chunk_size: Items whose accessors are evaluated together.
+
+    Responses
+
+    :streaming: Serialize the feed while it is sent in a StreamingHttpResponse
+        instead of rendering it into memory first. Cached feeds are never
+        streamed.
+    :stream_high_water_mark: Bytes buffered before a chunk of a streamed
+        feed is sent. Items are only read when the next chunk is requested.
+    :stream_fetch_size: Rows of items() fetched per query of a streamed feed.
+
+    Render budget
+
+    :max_items: Maximum number of items rendered.
+    :max_bytes: Size in bytes after which no further item is rendered.
+    :max_render_time: Seconds after which no further item is rendered.
+
+    Feeds exceeding their budget are closed without the remaining items, a
+    warning is logged, and unless they are streamed, the
+    X-DJANGO-ICAL-TRUNCATED calendar property and X-ICal-Truncated header
+    name the exceeded limit.
+
+    Caching
+
+    :cache_timeout: Seconds a rendered feed is cached, None disables caching.
+    :cache_alias: Cache the rendered feeds are stored in.
+    :render_lock_timeout: Seconds a render may hold the render lock. Requests
+        for a feed that is being rendered wait for that render instead of
+        rendering it again, for up to this long.
+    :render_wait_timeout: Maximum seconds a request waits for the render of
+        another request before rendering the feed itself.
+    :stale_timeout: Seconds an expired feed is still served while it is
+        refreshed in the background, None always renders expired feeds.
+    :refresh_backend: RefreshBackend running the background refreshes,
+        defaults to a thread pool shared by all feeds.
     """
 
     feed_type = feedgenerator.DefaultFeed
 
+    debug_queries = False
+    query_budget = None
+
+    paginate_by = None
+    page_key = "pk"
+    page_kwarg = "after"
+    index_kwarg = "pages"
+
+    item_fields = None
+    threaded_accessors = ()
+    accessor_workers = 4
+    accessor_chunk_size = 100
+
+    streaming = False
+    stream_high_water_mark = feedgenerator.CHUNK_SIZE
+    stream_fetch_size = 2000
+
+    max_items = None
+    max_bytes = None
+    max_render_time = None
+    deterministic = False
+
+    cache_timeout = None
+    cache_alias = DEFAULT_CACHE_ALIAS
+    render_lock_timeout = 60
+    render_wait_timeout = 5
+    render_poll_interval = 0.05
+    stale_timeout = None
+    refresh_backend = None
+
     def __call__(self, request, *args, **kwargs):
         """
         Copied from django.contrib.syndication.views.Feed
@@ -87,16 +368,64 @@ class ICalFeed(Feed):
         except ObjectDoesNotExist as exc:
             raise Http404("Feed object does not exist.") from exc
 
-        feedgen = self.get_feed(obj, request)
-        response = HttpResponse(content_type=feedgen.mime_type)
+        if self.paginate_by and self.index_kwarg in request.GET:
+            return self.get_index_response(obj, request)
 
-        if hasattr(self, "item_pubdate") or hasattr(self, "item_updateddate"):
+        etag = self.get_etag(obj, request)
+        if etag is not None and _etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        if self.cache_timeout is not None and not (
+            self.debug_queries or self.query_budget is not None
+        ):
+            return self.get_cached_response(obj, request, etag)
+        response = self.render(obj, request)
+        if etag is not None:
+            response["ETag"] = etag
+        return response
+
+    def render(self, obj, request, streaming=None):
+        """
+        Renders the feed of obj into a response.
+
+        The response is a StreamingHttpResponse serializing the feed while
+        it is sent if streaming, which defaults to the streaming attribute.
+        With debug_queries or query_budget, the feed is serialized before
+        the response is returned, so that all its queries are counted.
+        """
+        if streaming is None:
+            streaming = self.streaming
+        with ExitStack() as stack:
+            recorder = None
+            if self.debug_queries or self.query_budget is not None:
+                recorder = stack.enter_context(self._record_queries())
+            feedgen = self.get_feed(obj, request, lazy=streaming)
+            if streaming:
+                chunks = feedgen.iter_chunks("utf-8", self.stream_high_water_mark)
+                if recorder is not None:
+                    chunks = list(chunks)
+                response = StreamingHttpResponse(chunks, content_type=feedgen.mime_type)
+            else:
+                response = HttpResponse(content_type=feedgen.mime_type)
+                feedgen.write(response, "utf-8")
+                if feedgen.truncated:
+                    response["X-ICal-Truncated"] = feedgen.truncated
+        if recorder is not None:
+            recorder.check(self, self.query_budget)
+            response.query_recorder = recorder
+
+        if not feedgen.deferred_items and (
+            hasattr(self, "item_pubdate") or hasattr(self, "item_updateddate")
+        ):
             # if item_pubdate or item_updateddate is defined for the feed, set
             # header so as ConditionalGetMiddleware is able to send 304 NOT MODIFIED
+            # Items deferred until the feed is streamed aren't read yet, their
+            # dates are unknown.
             response["Last-Modified"] = http_date(
                 timegm(feedgen.latest_post_date().utctimetuple())
             )
-        feedgen.write(response, "utf-8")
 
         filename = self._get_dynamic_attr("file_name", obj)
         if filename:
@@ -104,24 +433,562 @@ class ICalFeed(Feed):
 
         return response
 
+    def get_etag(self, obj, request):
+        """
+        Returns the ETag of the feed of obj, computed from versions(obj)
+        without rendering the feed, or None if versions isn't defined.
+
+        versions returns a version, like a (pk, modified) tuple, for every
+        item. The versions are hashed one by one along with the feed class,
+        URL and language, so they can be streamed from a query fetching
+        only these columns.
+        """
+        versions = self._get_dynamic_attr("versions", obj)
+        if versions is None:
+            return None
+        digest = sha256(self._get_feed_identity(request).encode())
+        for version in versions:
+            digest.update(repr(version).encode())
+            digest.update(b"\n")
+        return quote_etag(digest.hexdigest())
+
+    def get_cache_key(self, obj, request):
+        """
+        Returns the cache key of the rendered feed of obj.
+
+        Defaults to one key per feed class, URL, language and authenticated
+        user. Feeds depending on other parts of the request, such as
+        headers or cookies, have to include them in the key.
+        """
+        key = self._get_feed_identity(request)
+        return "django_ical.feed." + sha256(key.encode()).hexdigest()
+
+    def _get_feed_identity(self, request):
+        user = getattr(request, "user", None)
+        return "%s.%s:%s:%s:%s" % (
+            type(self).__module__,
+            type(self).__qualname__,
+            request.build_absolute_uri(),
+            get_language(),
+            user.pk if user is not None and user.is_authenticated else "",
+        )
+
+    def _get_versioned_cache_key(self, obj, request, etag):
+        key = self.get_cache_key(obj, request)
+        if etag is not None:
+            # Changed items are never served from the cache.
+            key += "." + etag.strip('"')
+        return key
+
+    def get_cached_response(self, obj, request, etag=None):
+        """
+        Returns the cached feed of obj, rendering it when it is not cached.
+
+        Concurrent requests for the same feed are coalesced: the first one
+        takes a lock in the cache and renders the feed, the others wait for
+        its result. The lock lives in the cache, so this also works across
+        processes if the cache is shared.
+
+        With stale_timeout set, an expired feed is still returned while a
+        refresh is queued in the refresh backend.
+
+        With an etag from get_etag, the feed is cached per etag and sent
+        with it.
+        """
+        cache = caches[self.cache_alias]
+        key = self._get_versioned_cache_key(obj, request, etag)
+        deadline = monotonic() + min(self.render_wait_timeout, self.render_lock_timeout)
+        while True:
+            cached = cache.get(key)
+            if cached is not None:
+                content, headers, fresh_until = cached
+                if self.stale_timeout is not None and time() >= fresh_until:
+                    self.get_refresh_backend().enqueue(
+                        self._get_refresh_task(request, etag, key)
+                    )
+                return self._response_from_cache(request, content, headers)
+            response = self.refresh_cache(obj, request, etag, key, missing_only=True)
+            if response is not None:
+                return self._response_from_cache(
+                    request, response.content, response.items()
+                )
+            if monotonic() > deadline:
+                # The render holding the lock is taking too long.
+                return self.render(obj, request)
+            sleep(self.render_poll_interval)
+
+    def _get_refresh_task(self, request, etag, key):
+        match = request.resolver_match
+        return RefreshTask(
+            key=key,
+            feed="%s.%s" % (type(self).__module__, type(self).__qualname__),
+            url=request.build_absolute_uri(),
+            language=get_language(),
+            args=list(match.args) if match else [],
+            kwargs=dict(match.kwargs) if match else {},
+            etag=etag,
+        )
+
+    def refresh_cache(self, obj, request, etag=None, key=None, missing_only=False):
+        """
+        Renders the feed of obj into the cache and returns the response.
+
+        key defaults to the cache key of the feed in the active language.
+        Returns None without rendering when another render of the feed
+        holds the lock, or with missing_only when another render cached
+        the feed before the lock was taken.
+        """
+        cache = caches[self.cache_alias]
+        if key is None:
+            key = self._get_versioned_cache_key(obj, request, etag)
+        lock_key = key + ".lock"
+        token = uuid4().hex
+        if not cache.add(lock_key, token, self.render_lock_timeout):
+            return None
+        try:
+            if missing_only and cache.get(key) is not None:
+                return None
+            response = self.render(obj, request, streaming=False)
+            response["ETag"] = etag or quote_etag(sha256(response.content).hexdigest())
+            timeout = self.cache_timeout
+            fresh_until = time() + timeout
+            if self.stale_timeout is not None:
+                timeout += self.stale_timeout
+            cache.set(
+                key, (response.content, tuple(response.items()), fresh_until), timeout
+            )
+        finally:
+            # The lock may have expired during a slow render and been taken
+            # by another one, which keeps it.
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        return response
+
+    def get_refresh_backend(self):
+        """
+        Returns the backend refreshing stale feeds.
+        """
+        if self.refresh_backend is None:
+            return get_default_backend()
+        return self.refresh_backend
+
+    def _response_from_cache(self, request, content, headers):
+        """
+        Builds the response of cached content, answering Range requests
+        with the requested part of it.
+        """
+        headers = dict(headers)
+        status = 200
+        if request.method in ("GET", "HEAD") and _if_range_matches(request, headers):
+            try:
+                byte_range = parse_byte_range(
+                    request.headers.get("Range"), len(content)
+                )
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = "bytes */%d" % len(content)
+                return response
+            if byte_range is not None:
+                start, stop = byte_range
+                headers["Content-Range"] = "bytes %d-%d/%d" % (
+                    start,
+                    stop - 1,
+                    len(content),
+                )
+                content = content[start:stop]
+                status = 206
+        response = HttpResponse(content, status=status)
+        for header, value in headers.items():
+            response[header] = value
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    def get_feed(self, obj, request, lazy=False):
+        """
+        Copied from django.contrib.syndication.views.Feed
+
+        Items are fetched through get_items. If lazy, or if the feed has
+        a render budget, they are read while the feed is serialized instead,
+        see ICal20Feed.defer_items.
+        """
+        current_site = get_current_site(request)
+
+        link = self._get_dynamic_attr("link", obj)
+        link = add_domain(current_site.domain, link, request.is_secure())
+
+        feed = self.feed_type(
+            title=self._get_dynamic_attr("title", obj),
+            subtitle=self._get_dynamic_attr("subtitle", obj),
+            link=link,
+            description=self._get_dynamic_attr("description", obj),
+            language=self.language or get_language(),
+            feed_url=add_domain(
+                current_site.domain,
+                self._get_dynamic_attr("feed_url", obj) or request.path,
+                request.is_secure(),
+            ),
+            author_name=self._get_dynamic_attr("author_name", obj),
+            author_link=self._get_dynamic_attr("author_link", obj),
+            author_email=self._get_dynamic_attr("author_email", obj),
+            categories=self._get_dynamic_attr("categories", obj),
+            feed_copyright=self._get_dynamic_attr("feed_copyright", obj),
+            feed_guid=self._get_dynamic_attr("feed_guid", obj),
+            ttl=self._get_dynamic_attr("ttl", obj),
+            **self.feed_extra_kwargs(obj),
+        )
+
+        if "render_budget" in feed.feed:
+            # Only the items within the budget are read.
+            lazy = True
+        item_kwargs = self._get_item_kwargs(obj, request, current_site, lazy)
+        if lazy:
+            feed.defer_items(item_kwargs)
+        else:
+            for kwargs in item_kwargs:
+                feed.add_item(**kwargs)
+        return feed
+
+    def _get_item_kwargs(self, obj, request, current_site, lazy=False):
+        """
+        Yields the keyword arguments of feed.add_item for every item.
+
+        If lazy, QuerySets are read in batches of stream_fetch_size rows
+        instead of all at once.
+        """
+        if self.item_fields:
+            yield from self._get_slim_item_kwargs(obj, request, current_site)
+            return
+
+        title_tmp = None
+        if self.title_template is not None:
+            try:
+                title_tmp = loader.get_template(self.title_template)
+            except TemplateDoesNotExist:
+                pass
+
+        description_tmp = None
+        if self.description_template is not None:
+            try:
+                description_tmp = loader.get_template(self.description_template)
+            except TemplateDoesNotExist:
+                pass
+
+        tz = get_default_timezone()
+
+        for item in self._iter_items(self.get_items(obj, request), lazy):
+            context = self.get_context_data(
+                item=item, site=current_site, obj=obj, request=request
+            )
+            if title_tmp is not None:
+                title = title_tmp.render(context, request)
+            else:
+                title = self._get_dynamic_attr("item_title", item)
+            if description_tmp is not None:
+                description = description_tmp.render(context, request)
+            else:
+                description = self._get_dynamic_attr("item_description", item)
+            link = add_domain(
+                current_site.domain,
+                self._get_dynamic_attr("item_link", item),
+                request.is_secure(),
+            )
+            enclosures = self._get_dynamic_attr("item_enclosures", item)
+            author_name = self._get_dynamic_attr("item_author_name", item)
+            if author_name is not None:
+                author_email = self._get_dynamic_attr("item_author_email", item)
+                author_link = self._get_dynamic_attr("item_author_link", item)
+            else:
+                author_email = author_link = None
+
+            pubdate = self._get_dynamic_attr("item_pubdate", item)
+            if pubdate and is_naive(pubdate):
+                pubdate = make_aware(pubdate, tz)
+
+            updateddate = self._get_dynamic_attr("item_updateddate", item)
+            if updateddate and is_naive(updateddate):
+                updateddate = make_aware(updateddate, tz)
+
+            yield dict(
+                title=title,
+                link=link,
+                description=description,
+                unique_id=self._get_dynamic_attr("item_guid", item, link),
+                unique_id_is_permalink=self._get_dynamic_attr(
+                    "item_guid_is_permalink", item
+                ),
+                enclosures=enclosures,
+                pubdate=pubdate,
+                updateddate=updateddate,
+                author_name=author_name,
+                author_email=author_email,
+                author_link=author_link,
+                comments=self._get_dynamic_attr("item_comments", item),
+                categories=self._get_dynamic_attr("item_categories", item),
+                item_copyright=self._get_dynamic_attr("item_copyright", item),
+                **self.item_extra_kwargs(item),
+            )
+
+    def _iter_items(self, items, lazy):
+        if lazy and isinstance(items, QuerySet):
+            items = items.iterator(chunk_size=self.stream_fetch_size)
+        if self.threaded_accessors and QueryRecorder.active() is None:
+            # Recorded queries have to run in this thread to be counted.
+            return self._prefetch_accessors(items, get_language())
+        return items
+
+    def _prefetch_accessors(self, items, language):
+        """
+        Yields items after evaluating the threaded_accessors of every chunk
+        of accessor_chunk_size items in a thread pool, in language.
+
+        The database connections opened by the workers are closed once the
+        pool has shut down.
+        """
+        items = iter(items)
+        opened = set()
+        try:
+            with ThreadPoolExecutor(self.accessor_workers) as executor:
+                while True:
+                    chunk = list(islice(items, self.accessor_chunk_size))
+                    if not chunk:
+                        return
+                    futures = {
+                        (attname, id(item)): executor.submit(
+                            self._call_accessor, attname, item, language, opened
+                        )
+                        for item in chunk
+                        for attname in self.threaded_accessors
+                    }
+                    _prefetched.values = {
+                        key: future.result() for key, future in futures.items()
+                    }
+                    try:
+                        yield from chunk
+                    finally:
+                        _prefetched.values = None
+        finally:
+            _close_connections(opened)
+
+    def _call_accessor(self, attname, item, language, opened):
+        try:
+            with override(language):
+                return self._get_dynamic_attr(attname, item)
+        finally:
+            # Worker threads open their own database connections.
+            opened.update(
+                connection
+                for connection in connections.all()
+                if connection.connection is not None
+            )
+
+    def _get_slim_item_kwargs(self, obj, request, current_site):
+        """
+        Yields the keyword arguments of feed.add_item for every item, read
+        from the rows of items().values_list() with the lookups of
+        item_fields.
+
+        No model instances are created and the accessors of the mapped
+        fields aren't called. The item accessors defined on the feed for
+        the other fields are called with a dict of the row, keyed like
+        item_fields.
+        """
+        items = self.get_items(obj, request)
+        if not isinstance(items, QuerySet):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__}.items() must return a QuerySet "
+                "to use item_fields."
+            )
+
+        names = tuple(self.item_fields)
+        mapped = []
+        computed = []
+        for field, kwarg in ITEM_KWARGS:
+            if field in self.item_fields:
+                mapped.append((kwarg, names.index(field)))
+            elif self._defines_accessor("item_" + field):
+                computed.append((kwarg, self._get_row_accessor("item_" + field)))
+        extra_fields = [
+            kwarg for kwarg, _ in mapped + computed if kwarg in ICAL_EXTRA_FIELDS
+        ]
+
+        tz = get_default_timezone()
+        rows = items.values_list(*self.item_fields.values())
+        for row in rows.iterator(chunk_size=self.stream_fetch_size):
+            kwargs = {"title": None, "link": None, "description": None}
+            for kwarg, index in mapped:
+                kwargs[kwarg] = row[index]
+            if computed:
+                values = dict(zip(names, row))
+                for kwarg, accessor in computed:
+                    kwargs[kwarg] = accessor(values)
+
+            if kwargs["link"]:
+                kwargs["link"] = add_domain(
+                    current_site.domain, kwargs["link"], request.is_secure()
+                )
+            kwargs.setdefault("unique_id", kwargs["link"])
+            for field in ("pubdate", "updateddate"):
+                if kwargs.get(field) and is_naive(kwargs[field]):
+                    kwargs[field] = make_aware(kwargs[field], tz)
+            for field in extra_fields:
+                if not kwargs[field]:
+                    del kwargs[field]
+            recurrence = kwargs.pop("recurrence", None)
+            if recurrence:
+                for field, val in build_properties_from_recurrence(recurrence).items():
+                    kwargs.setdefault(field, val)
+            yield kwargs
+
+    @classmethod
+    def _defines_accessor(cls, attname):
+        """
+        Whether attname is defined by the feed rather than by Feed, whose
+        accessors expect model instances.
+        """
+        attr = getattr(cls, attname, None)
+        return attr is not None and attr is not getattr(Feed, attname, None)
+
+    def _get_row_accessor(self, attname):
+        """
+        Returns a callable reading attname for a row, resolving whether it
+        is a constant or an accessor taking no or one argument once.
+        """
+        attr = getattr(self, attname)
+        if not callable(attr):
+            return lambda row: attr
+        if _count_args(attr) > 1:
+            raise TypeError(
+                "Number of arguments to _get_dynamic_attr needs to be 0 or 1"
+            )
+        if _count_args(attr):
+            return attr
+        return lambda row: attr()
+
+    def get_items(self, obj, request):
+        """
+        Returns the items of the feed, or of the requested page if the
+        feed is paginated.
+
+        Pages are selected with keyset pagination on page_key so a page's
+        URL stays stable when items are added to or removed from other pages.
+        """
+        items = self._get_dynamic_attr("items", obj)
+        if not self.paginate_by:
+            return items
+
+        items = self._get_ordered_items(items)
+        after = request.GET.get(self.page_kwarg)
+        if after is not None:
+            after = self._get_page_key_value(items.model, after)
+            items = items.filter(**{self.page_key + "__gt": after})
+        return items[: self.paginate_by]
+
+    def _get_page_key_value(self, model, value):
+        """
+        Converts the page_kwarg query parameter with the page_key field,
+        raises Http404 if it isn't a valid value.
+        """
+        try:
+            if self.page_key == "pk":
+                field = model._meta.pk
+            else:
+                field = model._meta.get_field(self.page_key)
+        except FieldDoesNotExist:
+            # A lookup spanning relations, checked by the query.
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError as exc:
+            raise Http404("Invalid page %r." % value) from exc
+
+    def get_page_keys(self, obj):
+        """
+        Returns the keys every page but the first one starts after.
+        """
+        items = self._get_ordered_items(self._get_dynamic_attr("items", obj))
+        keys = []
+        pending = None
+        for index, key in enumerate(
+            items.values_list(self.page_key, flat=True).iterator(), 1
+        ):
+            if pending is not None:
+                keys.append(pending)
+                pending = None
+            if index % self.paginate_by == 0:
+                pending = key
+        return keys
+
+    def get_index_response(self, obj, request):
+        """
+        Returns the URLs of all pages of the feed as a text/uri-list.
+        """
+        query = request.GET.copy()
+        query.pop(self.index_kwarg)
+        query.pop(self.page_kwarg, None)
+
+        urls = [request.build_absolute_uri(self._get_page_path(request, query))]
+        for key in self.get_page_keys(obj):
+            query[self.page_kwarg] = str(key)
+            urls.append(request.build_absolute_uri(self._get_page_path(request, query)))
+        return HttpResponse(
+            "".join(url + "\r\n" for url in urls),
+            content_type="text/uri-list; charset=utf-8",
+        )
+
+    @staticmethod
+    def _get_page_path(request, query):
+        if query:
+            return f"{request.path}?{query.urlencode()}"
+        return request.path
+
+    def _get_ordered_items(self, items):
+        if not isinstance(items, QuerySet):
+            raise ImproperlyConfigured(
+                f"{type(self).__name__}.items() must return a QuerySet "
+                "to be paginated."
+            )
+        return items.order_by(self.page_key)
+
+    @contextmanager
+    def _record_queries(self):
+        """
+        Counts the queries run by each accessor within the block.
+        """
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            stack.enter_context(recorder)
+            yield recorder
+
     def _get_dynamic_attr(self, attname, obj, default=None):
         """
         Copied from django.contrib.syndication.views.Feed (v1.7.1)
+
+        Returns the value evaluated ahead for threaded_accessors, if any.
         """
+        prefetched = _prefetched.values
+        if prefetched:
+            try:
+                return prefetched[attname, id(obj)]
+            except KeyError:
+                pass
         try:
             attr = getattr(self, attname)
         except AttributeError:
             return default
         if callable(attr):
-            num_args = len(signature(attr).parameters)
-            if num_args == 0:
-                return attr()
-            if num_args == 1:
-                return attr(obj)
+            num_args = _count_args(attr)
+            if num_args > 1:
+                raise TypeError(
+                    "Number of arguments to _get_dynamic_attr needs to be 0 or 1"
+                )
+            args = (obj,) if num_args else ()
 
-            raise TypeError(
-                "Number of arguments to _get_dynamic_attr needs to be 0 or 1"
-            )
+            recorder = QueryRecorder.active()
+            if recorder is not None:
+                return recorder.record(attname, attr, *args)
+            return attr(*args)
         return attr
 
     # NOTE: Not used by icalendar but required
@@ -132,14 +999,53 @@ class ICalFeed(Feed):
         return "PUBLISH"
 
     def feed_extra_kwargs(self, obj):
-        kwargs = {}
-        for field in FEED_EXTRA_FIELDS:
+        static_kwargs, dynamic_fields = self._get_feed_extra_fields()
+        kwargs = dict(static_kwargs)
+        for field in dynamic_fields:
             val = self._get_dynamic_attr(field, obj)
             if val:
                 kwargs[field] = val
+        limits = (self.max_items, self.max_bytes, self.max_render_time)
+        if any(limit is not None for limit in limits):
+            kwargs["render_budget"] = feedgenerator.RenderBudget(*limits)
         return kwargs
 
-    def item_timestamp(self, obj):  # pylint: disable=unused-argument
+    def _get_feed_extra_fields(self):
+        """
+        Splits FEED_EXTRA_FIELDS into the values of constant attributes,
+        which are resolved once per class, and the fields that have to be
+        resolved for every request.
+        """
+        cls = type(self)
+        fields = cls.__dict__.get("_feed_extra_fields")
+        if fields is None:
+            static_kwargs = {}
+            dynamic_fields = []
+            for field in FEED_EXTRA_FIELDS:
+                attr = getattr_static(cls, field, None)
+                if callable(attr) or hasattr(type(attr), "__get__"):
+                    # Methods and descriptors, like properties.
+                    dynamic_fields.append(field)
+                elif attr:
+                    static_kwargs[field] = attr
+            fields = (static_kwargs, tuple(dynamic_fields))
+            cls._feed_extra_fields = fields
+
+        if set(FEED_EXTRA_FIELDS).intersection(vars(self)):
+            # Attributes set on the instance override the class.
+            return {}, FEED_EXTRA_FIELDS
+        return fields
+
+    def timestamp(self, obj):
+        """
+        Returns the render timestamp, used as the DTSTAMP of items that
+        have neither a timestamp nor an updateddate.
+
+        Deterministic feeds use a fixed timestamp instead, so they render
+        identical bytes even when no item has a date.
+        """
+        if self._get_dynamic_attr("deterministic", obj):
+            return feedgenerator.DETERMINISTIC_TIMESTAMP
         return datetime.now()
 
     def item_extra_kwargs(self, item):
@@ -148,4 +1054,186 @@ class ICalFeed(Feed):
             val = self._get_dynamic_attr("item_" + field, item)
             if val:
                 kwargs[field] = val
+        self._add_recurrence_kwargs(kwargs, item)
+        return kwargs
+
+    def _add_recurrence_kwargs(self, kwargs, item):
+        """
+        Fills rrule, exrule, rdate and exdate from item_recurrence, a
+        django_recurrences Recurrence, unless their own accessors are set.
+        """
+        recurrence = self._get_dynamic_attr("item_recurrence", item)
+        if recurrence:
+            for field, val in build_properties_from_recurrence(recurrence).items():
+                kwargs.setdefault(field, val)
+
+
+class ICalFreeBusyFeed(ICalFeed):
+    """
+    iCalendar free/busy feed
+
+    Publishes the busy time of the items between freebusy_start and
+    freebusy_end as a single VFREEBUSY component instead of the items
+    themselves. Items are read with the same accessors as ICalFeed,
+    but only the ones needed to compute busy time are called.
+
+    :freebusy_start: DTSTART, defaults to now
+    :freebusy_end: DTEND, defaults to freebusy_period after freebusy_start
+    :occurrence_index: OccurrenceIndex of the busy items, used instead of
+        expanding the rules of all items for every request
+    """
+
+    feed_type = feedgenerator.ICal20FreeBusyFeed
+
+    freebusy_period = timedelta(days=90)
+
+    def freebusy_start(self, obj):  # pylint: disable=unused-argument
+        return now()
+
+    def feed_extra_kwargs(self, obj):
+        kwargs = super().feed_extra_kwargs(obj)
+        start = self._get_dynamic_attr("freebusy_start", obj)
+        end = self._get_dynamic_attr("freebusy_end", obj)
+        kwargs["freebusy_start"] = start
+        kwargs["freebusy_end"] = end or start + self.freebusy_period
+        kwargs["occurrence_index"] = self._get_dynamic_attr("occurrence_index", obj)
         return kwargs
+
+    def get_items(self, obj, request):
+        if self._get_dynamic_attr("occurrence_index", obj) is not None:
+            # The busy time is read from the index.
+            return []
+        return super().get_items(obj, request)
+
+    def _get_item_kwargs(self, obj, request, current_site, lazy=False):
+        for item in self._iter_items(self.get_items(obj, request), lazy):
+            kwargs = {"title": None, "link": None, "description": None}
+            for field in FREEBUSY_FIELDS:
+                val = self._get_dynamic_attr("item_" + field, item)
+                if val:
+                    kwargs[field] = val
+            self._add_recurrence_kwargs(kwargs, item)
+            yield kwargs
+
+
+class ICalMergedFeed(ICalFeed):
+    """
+    iCalendar feed combining the items of several feeds
+
+    Serves the items of many feeds as one calendar in a single request.
+    Items are deduplicated by their UID, the first feed listing an item
+    wins. The calendar properties, like the title and timezone, are the
+    ones of the merged feed.
+
+    :feeds: ICalFeed classes or instances to merge, rendered for the
+        object of the merged feed. Override get_feeds to give them objects
+        of their own.
+    :concurrent: Read the items of the feeds in a thread pool.
+    :feed_workers: Maximum number of threads reading feeds.
+    """
+
+    feeds = ()
+    concurrent = False
+    feed_workers = 4
+
+    def get_feeds(self, obj, request):  # pylint: disable=unused-argument
+        """
+        Returns (feed, obj) pairs of the feeds to merge and their objects.
+        """
+        return [
+            (feed() if isinstance(feed, type) else feed, obj)
+            for feed in self._get_dynamic_attr("feeds", obj)
+        ]
+
+    def _get_item_kwargs(self, obj, request, current_site, lazy=False):
+        feeds = self.get_feeds(obj, request)
+        if self.concurrent and len(feeds) > 1:
+            item_kwargs = self._read_feeds(
+                feeds, request, current_site, lazy, get_language()
+            )
+        else:
+            item_kwargs = chain.from_iterable(
+                feed._get_item_kwargs(feed_obj, request, current_site, lazy)
+                for feed, feed_obj in feeds
+            )
+        return self._iter_unique(item_kwargs)
+
+    @staticmethod
+    def _iter_unique(item_kwargs):
+        seen = set()
+        for kwargs in item_kwargs:
+            unique_id = kwargs.get("unique_id")
+            if unique_id is not None:
+                if unique_id in seen:
+                    continue
+                seen.add(unique_id)
+            yield kwargs
+
+    def _read_feeds(self, feeds, request, current_site, lazy, language):
+        """
+        Yields the add_item keyword arguments of the items of feeds, read
+        in a thread pool, in the order of the feeds.
+
+        If lazy, every thread reads ahead at most stream_fetch_size items
+        of its feed, and stops once the items are no longer consumed, so a
+        render budget or a streamed response bounds the rows fetched.
+        """
+        size = self.stream_fetch_size if lazy else 0
+        queues = [Queue(size) for _ in feeds]
+        stop = Event()
+        opened = set()
+        try:
+            with ThreadPoolExecutor(min(self.feed_workers, len(feeds))) as executor:
+                try:
+                    for (feed, feed_obj), queue in zip(feeds, queues):
+                        executor.submit(
+                            self._read_feed,
+                            feed,
+                            feed_obj,
+                            request,
+                            current_site,
+                            lazy,
+                            language,
+                            queue,
+                            stop,
+                            opened,
+                        )
+                    for queue in queues:
+                        while True:
+                            kwargs = queue.get()
+                            if isinstance(kwargs, _FeedEnd):
+                                if kwargs.error is not None:
+                                    raise kwargs.error
+                                break
+                            yield kwargs
+                finally:
+                    stop.set()
+        finally:
+            _close_connections(opened)
+
+    @staticmethod
+    def _read_feed(  # noqa
+        feed, obj, request, current_site, lazy, language, queue, stop, opened
+    ):
+        """
+        Puts the add_item keyword arguments of the items of feed in queue,
+        in a thread of the pool and the language of the request.
+        """
+        if stop.is_set():
+            return
+        error = None
+        try:
+            with override(language):
+                for kwargs in feed._get_item_kwargs(obj, request, current_site, lazy):
+                    if not _put(queue, kwargs, stop):
+                        return
+        except Exception as exc:  # pylint: disable=broad-except
+            error = exc
+        finally:
+            # Worker threads open their own database connections.
+            opened.update(
+                connection
+                for connection in connections.all()
+                if connection.connection is not None
+            )
+        _put(queue, _FeedEnd(error), stop)
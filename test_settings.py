@@ -1,5 +1,6 @@
 TIME_ZONE="UTC"
 SECRET_KEY="snakeoil"
+DEFAULT_AUTO_FIELD="django.db.models.AutoField"
 
 DATABASES={
   "default": {
@@ -11,6 +12,7 @@ DATABASES={
 INSTALLED_APPS=[
   "django.contrib.contenttypes",
   "django_ical",
+  "django_ical.tests",
 ]
 
 MIDDLEWARE_CLASSES=[